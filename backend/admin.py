@@ -2,7 +2,6 @@ import os
 import sys
 import time
 import subprocess
-import shutil
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -12,6 +11,8 @@ load_dotenv()
 from app import create_app
 from extensions import db
 from models import User, FavoriteTeam, SavedFixture, LoginLog
+from migrations import upgrade as upgrade_schema
+from services import feed_cache
 from config import FOOTBALL_API_KEY
 from werkzeug.security import generate_password_hash
 from sqlalchemy import func, case
@@ -19,7 +20,7 @@ from sqlalchemy import func, case
 # --- Configuration ---
 INSTANCE_DB = os.path.join('instance', 'sport_calendar.db')
 BACKEND_DB = os.path.join('backend', 'instance', 'sport_calendar.db')
-CACHE_DIR = os.path.join(os.getcwd(), 'instance', 'cache')
+FEED_EVICT_DAYS = 30  # Feeds not rebuilt for this long belong to users who stopped polling
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -68,11 +69,10 @@ def system_monitor():
     except Exception as e:
         print(f"Error reading DB: {e}")
 
-    # Cache Size
-    if os.path.exists(CACHE_DIR):
-        files = os.listdir(CACHE_DIR)
-        size = sum(os.path.getsize(os.path.join(CACHE_DIR, f)) for f in files) / 1024
-        print(f"\nCache: {len(files)} files ({size:.2f} KB)")
+    # Cache Size (from the shard manifests)
+    cache = feed_cache.usage()
+    if cache['feeds']:
+        print(f"\nCache: {cache['feeds']} feeds ({cache['bytes'] / 1024:.2f} KB in {cache['shards']} shards)")
     else:
         print("\nCache: Empty")
 
@@ -107,8 +107,10 @@ def manage_users():
                 user = User.query.get(uid)
                 if user:
                     if input(f"Delete {user.username}? (y/n): ") == 'y':
+                        username = user.username
                         db.session.delete(user)
                         db.session.commit()
+                        feed_cache.remove(username)
                         print("User deleted.")
                         time.sleep(1)
                 else:
@@ -138,17 +140,14 @@ def maintenance_menu():
         print("1. Clear ICS Cache")
         print("2. Prune Old Fixtures (Past dates)")
         print("3. Wipe Database (Reset All)")
-        print("4. Back")
+        print(f"4. Evict Unused ICS Feeds (not rebuilt in {FEED_EVICT_DAYS} days)")
+        print("5. Back")
         
         choice = input("\nSelect: ")
         
         if choice == '1':
-            if os.path.exists(CACHE_DIR):
-                shutil.rmtree(CACHE_DIR)
-                os.makedirs(CACHE_DIR)
-                print("Cache cleared.")
-            else:
-                print("Cache already empty.")
+            feed_cache.clear()
+            print("Cache cleared.")
             time.sleep(1)
             
         elif choice == '2':
@@ -158,11 +157,18 @@ def maintenance_menu():
         elif choice == '3':
             if input("TYPE 'DESTROY' TO CONFIRM DATA WIPE: ") == 'DESTROY':
                 db.drop_all()
-                db.create_all()
+                db.session.execute(db.text("DROP TABLE IF EXISTS schema_version"))
+                db.session.commit()
+                upgrade_schema(db.engine)
                 print("Database reset complete.")
                 time.sleep(1)
                 
         elif choice == '4':
+            removed = feed_cache.evict(FEED_EVICT_DAYS * 86400)
+            print(f"Evicted {removed} feeds.")
+            time.sleep(1)
+            
+        elif choice == '5':
             break
 
 # --- 4. Server Ops ---
@@ -251,7 +257,10 @@ def analyze_logs():
             cutoff = datetime.utcnow() - timedelta(days=days)
             query = query.filter(LoginLog.timestamp >= cutoff)
             
-        results = query.group_by(LoginLog.username, LoginLog.email).all()
+        # Grouped and ordered like ix_login_logs_username_email_timestamp_status,
+        # which covers the query: no table scan or temporary sort
+        results = query.group_by(LoginLog.username, LoginLog.email) \
+            .order_by(LoginLog.username, LoginLog.email).all()
         
         print(f"\n{'Username':<20} {'Email':<30} {'SUCCESS':<8} {'FAILED':<8}")
         print("-" * 80)
@@ -344,10 +353,9 @@ def run_full_diagnostics():
     
     # 5. Cache Status
     print("\n📁 Cache Status:")
-    if os.path.exists(CACHE_DIR):
-        files = os.listdir(CACHE_DIR)
-        size = sum(os.path.getsize(os.path.join(CACHE_DIR, f)) for f in files) / 1024
-        print(f"  Files: {len(files)}, Size: {size:.2f} KB")
+    cache = feed_cache.usage()
+    if cache['feeds']:
+        print(f"  Feeds: {cache['feeds']}, Size: {cache['bytes'] / 1024:.2f} KB, Shards: {cache['shards']}")
     else:
         print("  Cache directory empty/missing")
     
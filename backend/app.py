@@ -2,25 +2,64 @@
 Match Calendar Backend - Main Application
 Flask API server for managing sports fixtures and user favorites
 """
+import hmac
 import os
 from datetime import timedelta
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from dotenv import load_dotenv
 from extensions import db, jwt, mail
+from services.db_profile import configure_engines, install_engine_events
 
 load_dotenv()
 
-def create_app():
-    """Create and configure Flask application"""
+def create_app(check_schema=True):
+    """
+    Create and configure Flask application.
+    
+    check_schema=False skips the schema version check (used by the migration CLI).
+    """
     app = Flask(__name__)
     
     # Configuration
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///sport_calendar.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Apply pending schema migrations at startup (set False in production and
+    # run `python -m migrations upgrade` as a deploy step instead)
+    app.config['DB_AUTO_MIGRATE'] = os.getenv('DB_AUTO_MIGRATE', 'True') == 'True'
+
+    # Read bind for feeds and /calendar/events: a replica URL, or a read-only pool on the primary
+    app.config['DATABASE_READ_URL'] = os.getenv('DATABASE_READ_URL', '')
+    app.config['DB_READ_POOL'] = os.getenv('DB_READ_POOL', 'True') == 'True'
+
+    # Connection pools and timeouts (see services/db_profile.py)
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 16))
+    app.config['DB_POOL_OVERFLOW'] = int(os.getenv('DB_POOL_OVERFLOW', 16))
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))  # server DBs only
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'True') == 'True'
+    app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))  # 0 = none
+    app.config['DB_READ_STATEMENT_TIMEOUT_MS'] = int(os.getenv('DB_READ_STATEMENT_TIMEOUT_MS', 5000))
+
+    # SQLite performance profile (WAL + pragmas on pooled connections)
+    app.config['SQLITE_PROFILE'] = os.getenv('SQLITE_PROFILE', 'True') == 'True'
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 10000))
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    app.config['SQLITE_CACHE_SIZE_KB'] = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-this')
+    # Bearer token for /api/health/caches (internal counters); unset = endpoint disabled
+    app.config['HEALTH_TOKEN'] = os.getenv('HEALTH_TOKEN', '')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
 
+    # Background fixture refresher (keeps the shared fixture store fresh for ICS feeds)
+    app.config['FIXTURE_REFRESHER'] = os.getenv('FIXTURE_REFRESHER', 'True') == 'True'
+    app.config['FIXTURE_REFRESH_TICK'] = int(os.getenv('FIXTURE_REFRESH_TICK', 30))
+
+    # Scheduled team-centric favorites sync (one upstream fetch per followed team)
+    app.config['FANOUT_SYNC'] = os.getenv('FANOUT_SYNC', 'True') == 'True'
+    app.config['FANOUT_SYNC_INTERVAL'] = int(os.getenv('FANOUT_SYNC_INTERVAL', 3600))
+
     # Mail Configuration
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
@@ -33,7 +72,10 @@ def create_app():
     app.config['MAIL_DEFAULT_SENDER'] = ("Matchday Team", sender_address)
     
     # Initialize extensions
+    configure_engines(app)
     db.init_app(app)
+    with app.app_context():
+        install_engine_events(app)
     jwt.init_app(app)
     mail.init_app(app)
     # Allow CORS for all routes (API + Calendar logic)
@@ -54,6 +96,26 @@ def create_app():
     def health_check():
         return jsonify({'status': 'ok', 'message': 'Match Calendar Backend is running'}), 200
     
+    # Cache/pool counters for sizing (per process). Operators only: the public
+    # proxy forwards /api/health*, and the pragma report checks out connections.
+    @app.route('/api/health/caches', methods=['GET'])
+    def cache_stats():
+        token = app.config['HEALTH_TOKEN']
+        supplied = request.headers.get('Authorization', '').encode('utf-8')
+        if not token or not hmac.compare_digest(supplied, f"Bearer {token}".encode('utf-8')):
+            return jsonify({'error': 'Not found'}), 404
+        from services import feed_cache
+        from services.football_service import football_api
+        from services.db_profile import pragma_report
+        from services.identity import identity_cache
+        return jsonify({
+            'feed_cache': feed_cache.stats(),
+            'identity_cache': identity_cache.stats(),
+            'api_cache': football_api.get_cache_stats(),
+            'api_pool': football_api.get_pool_stats(),
+            'db': {bind or 'primary': pragma_report(engine) for bind, engine in db.engines.items()}
+        }), 200
+    
     # Register blueprints
     with app.app_context():
         from routes.auth import auth_bp
@@ -68,14 +130,56 @@ def create_app():
         app.register_blueprint(fixtures_bp, url_prefix='/api/fixtures')
         app.register_blueprint(calendar_bp, url_prefix='/') # Mount logic at root for /sync/...
         
-        # Create tables
-        db.create_all()
+        # Schema is managed by versioned migrations (see migrations/)
+        if check_schema:
+            from migrations import check_schema as _check_schema
+            _check_schema(app, db.engine)
     
     return app
 
+def start_fixture_refresher(app):
+    """
+    Start the background fixture refresher for this process (if enabled and
+    no other process on this machine runs it, e.g. the sport-refresher service)
+    """
+    if not app.config['FIXTURE_REFRESHER']:
+        return None
+    from services import worker_lock
+    if not worker_lock.acquire('fixture_refresher'):
+        print('Fixture refresher already runs in another process')
+        return None
+    from services.fixture_refresher import FixtureRefresher
+    from services.football_service import football_api
+    refresher = FixtureRefresher(app, football_api, tick=app.config['FIXTURE_REFRESH_TICK'])
+    app.extensions['fixture_refresher'] = refresher
+    refresher.start()
+    return refresher
+
+def start_fanout_sync(app):
+    """
+    Start the scheduled fan-out favorites sync for this process (if enabled and
+    no other process on this machine runs it, e.g. the sport-fanout service)
+    """
+    if not app.config['FANOUT_SYNC']:
+        return None
+    from services import worker_lock
+    if not worker_lock.acquire('fanout_sync'):
+        print('Fan-out sync already runs in another process')
+        return None
+    from services.fanout_sync import FanoutSync
+    from services.football_service import football_api
+    fanout = FanoutSync(app, football_api, interval=app.config['FANOUT_SYNC_INTERVAL'])
+    app.extensions['fanout_sync'] = fanout
+    fanout.start()
+    return fanout
+
 if __name__ == '__main__':
     app = create_app()
     port = int(os.getenv('FLASK_PORT', 8000))
     debug = os.getenv('FLASK_ENV') == 'development'
+    # With the reloader, only the child process that serves requests runs workers
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_fixture_refresher(app)
+        start_fanout_sync(app)
     print(f'🚀 Match Calendar Backend running on http://localhost:{port}')
     app.run(debug=debug, host='0.0.0.0', port=port)
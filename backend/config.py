@@ -7,3 +7,26 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))  # root .env
 
 FOOTBALL_API_KEY = os.getenv('FOOTBALL_API_KEY', 'demo_key_12345')
 API_BASE_URL = os.getenv('API_BASE_URL', 'https://v3.football.api-sports.io')
+
+# HTTP connection pool for upstream API calls (see services/football_service.py)
+API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', 10))
+API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', 3.05))
+API_READ_TIMEOUT = float(os.getenv('API_READ_TIMEOUT', 10))
+API_MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', 3))
+API_RETRY_BACKOFF = float(os.getenv('API_RETRY_BACKOFF', 0.5))
+API_BATCH_DEADLINE = float(os.getenv('API_BATCH_DEADLINE', 15))  # per-call budget for chunked fetches
+
+# Upstream response cache: memory LRU bounded by bytes, optional SQLite file for persistence
+API_CACHE_MAX_BYTES = int(os.getenv('API_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+API_CACHE_PATH = os.getenv('API_CACHE_PATH', '')  # e.g. instance/api_cache.sqlite; empty = memory only
+
+# In-memory tier for per-user ICS feeds (in front of instance/cache files)
+FEED_CACHE_MEMORY_BYTES = int(os.getenv('FEED_CACHE_MEMORY_BYTES', 64 * 1024 * 1024))
+FEED_REBUILD_WORKERS = int(os.getenv('FEED_REBUILD_WORKERS', 2))  # background stale-feed rebuilds
+FEED_STALE_WAIT = float(os.getenv('FEED_STALE_WAIT', 0.25))  # seconds a poll waits on a rebuild before getting the stale copy
+FEED_STREAM_BATCH = int(os.getenv('FEED_STREAM_BATCH', 500))  # fixtures per DB fetch while building a feed
+FEED_LARGE_BYTES = int(os.getenv('FEED_LARGE_BYTES', 1024 * 1024))  # cached feeds this big are sent from disk in blocks
+
+# Process-wide cache of JWT caller identities (user id -> id, username), see services/identity.py
+IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', 300))  # seconds; 0 disables
+IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', 10000))
@@ -38,9 +38,6 @@ def delete_user(username):
 def main():
     app = create_app()
     with app.app_context():
-        # Create tables if they don't exist (just in case)
-        db.create_all()
-        
         while True:
             users = list_users()
             if not users:
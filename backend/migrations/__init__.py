@@ -0,0 +1,36 @@
+"""
+Schema Migrations
+Versioned migrations for the app database (replaces db.create_all() on boot
+and the one-off dev_scripts/migrate_*.py scripts).
+
+    python -m migrations            # show applied / pending versions
+    python -m migrations upgrade    # apply pending migrations
+"""
+from migrations.runner import upgrade, current_version, latest_version, status
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def check_schema(app, engine):
+    """
+    Compare the database's schema version with the code's (one query).
+
+    Applies pending migrations when DB_AUTO_MIGRATE is set, otherwise raises
+    SchemaOutOfDate so a deploy never serves against an old schema.
+    """
+    current, latest = current_version(engine), latest_version()
+    if current == latest:
+        return current
+    if current > latest:
+        raise SchemaOutOfDate(
+            f"Database schema version {current} is newer than this code ({latest})"
+        )
+    if app.config.get('DB_AUTO_MIGRATE'):
+        upgrade(engine)
+        return latest
+    raise SchemaOutOfDate(
+        f"Database schema is at version {current}, code expects {latest}. "
+        f"Run: python -m migrations upgrade"
+    )
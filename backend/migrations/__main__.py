@@ -0,0 +1,31 @@
+import argparse
+import os
+
+# Long index builds and backfills must not hit the app's statement timeout
+os.environ['DB_STATEMENT_TIMEOUT_MS'] = '0'
+
+from app import create_app
+from extensions import db
+from migrations import upgrade, status
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m migrations')
+    parser.add_argument('command', nargs='?', default='status', choices=['status', 'upgrade'])
+    parser.add_argument('--to', type=int, default=None, help='stop at this version')
+    parser.add_argument('--batch-size', type=int, default=500, help='rows per backfill batch')
+    args = parser.parse_args()
+
+    app = create_app(check_schema=False)
+    with app.app_context():
+        engine = db.engine
+        if args.command == 'upgrade':
+            applied = upgrade(engine, target=args.to, batch_size=args.batch_size)
+            print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+        for version, name, applied_at in status(engine):
+            state = applied_at.strftime('%Y-%m-%d %H:%M') if applied_at else 'pending'
+            print(f"{version:03d}  {name:<50} {state}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Migration Runner
+Applies numbered schema migrations and records them in `schema_version`.
+
+Each migration module defines VERSION (int) and upgrade(ctx). Steps run in
+short transactions rather than one long one, so the app keeps serving while
+a migration runs: DDL is applied statement by statement and backfills walk
+the table in keyset batches, committing (and yielding to writers) after each
+batch. Every step is written to be safe to re-run, so a migration that was
+interrupted half way simply runs again.
+
+upgrade() holds a cross-process lock for its whole run (pg_advisory_lock on
+PostgreSQL, a lock file next to a SQLite database), so app processes booting
+together with DB_AUTO_MIGRATE apply each migration once: the others wait,
+then find the schema up to date.
+"""
+import importlib
+import os
+import pkgutil
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import sqlalchemy as sa
+
+try:
+    import fcntl
+except ImportError:  # Windows: SQLite upgrades aren't serialised across processes
+    fcntl = None
+
+PG_LOCK_KEY = 4_815_162_342  # pg_advisory_lock key reserved for migrations
+
+_meta = sa.MetaData()
+schema_version = sa.Table(
+    'schema_version', _meta,
+    sa.Column('version', sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column('name', sa.String(120), nullable=False),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+)
+
+
+def load_migrations():
+    """Migration modules in this package, ordered by VERSION"""
+    import migrations
+    modules = []
+    for info in pkgutil.iter_modules(migrations.__path__):
+        if info.name.startswith('v') and info.name[1:4].isdigit():
+            modules.append(importlib.import_module(f"migrations.{info.name}"))
+    modules.sort(key=lambda m: m.VERSION)
+    versions = [m.VERSION for m in modules]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return modules
+
+
+def migration_name(module):
+    return (module.__doc__ or module.__name__).strip().splitlines()[0]
+
+
+def latest_version():
+    migrations = load_migrations()
+    return migrations[-1].VERSION if migrations else 0
+
+
+def current_version(engine):
+    """Highest applied version (0 for a database the framework hasn't touched)"""
+    with engine.connect() as conn:
+        if not sa.inspect(conn).has_table('schema_version'):
+            return 0
+        return conn.execute(sa.select(sa.func.max(schema_version.c.version))).scalar() or 0
+
+
+class MigrationContext:
+    """What a migration's upgrade() works with: the engine plus online-safe helpers"""
+
+    def __init__(self, engine, batch_size=500, pause=0.05, log=print):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.batch_size = batch_size
+        self.pause = pause  # seconds between backfill batches, lets app writes through
+        self.log = log
+
+    def inspector(self):
+        return sa.inspect(self.engine)  # fresh each time; inspectors cache
+
+    def has_table(self, table):
+        return self.inspector().has_table(table)
+
+    def columns(self, table):
+        if not self.has_table(table):
+            return []
+        return [col['name'] for col in self.inspector().get_columns(table)]
+
+    def execute(self, statement, params=None):
+        """Run one statement in its own short transaction"""
+        if isinstance(statement, str):
+            statement = sa.text(statement)
+        with self.engine.begin() as conn:
+            return conn.execute(statement, params or {})
+
+    def create_table(self, table):
+        """Create a (frozen) Table definition if missing"""
+        with self.engine.begin() as conn:
+            table.create(conn, checkfirst=True)
+
+    def add_column(self, table, column):
+        """ALTER TABLE ... ADD COLUMN for a sa.Column, if missing"""
+        if column.name in self.columns(table):
+            return False
+        ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(self.engine.dialect)}"
+        if column.server_default is not None:
+            default = column.server_default.arg
+            if not isinstance(default, str):
+                default = default.compile(dialect=self.engine.dialect)
+            ddl += f" DEFAULT {default}"
+        self.execute(ddl)
+        self.log(f"  - Added {table}.{column.name}")
+        return True
+
+    def drop_column(self, table, column):
+        if column not in self.columns(table):
+            return False
+        self.execute(f"ALTER TABLE {table} DROP COLUMN {column}")  # SQLite >= 3.35
+        self.log(f"  - Dropped {table}.{column}")
+        return True
+
+    def create_index(self, name, table, columns, unique=False):
+        if not self.has_table(table):
+            return
+        self.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+                     f"ON {table} ({', '.join(columns)})")
+
+    def backfill(self, table, columns, process, key='id', where=None):
+        """
+        Walk a table in keyset batches of batch_size rows ordered by key.
+
+        process(conn, rows) runs inside one transaction per batch; the batch
+        commits before the next one is read, so no lock is held for longer
+        than a single batch. Returns the number of rows visited.
+        """
+        t = sa.table(table, *(sa.column(c) for c in set(columns) | {key}))
+        query = sa.select(*(t.c[c] for c in columns)).order_by(t.c[key]).limit(self.batch_size)
+        if where is not None:
+            query = query.where(sa.text(where))
+        key_index = columns.index(key)
+        last = None
+        visited = 0
+        while True:
+            with self.engine.begin() as conn:
+                batch_query = query if last is None else query.where(t.c[key] > last)
+                rows = conn.execute(batch_query).fetchall()
+                if not rows:
+                    break
+                process(conn, rows)
+            visited += len(rows)
+            last = rows[-1][key_index]
+            if len(rows) < self.batch_size:
+                break
+            if self.pause:
+                time.sleep(self.pause)
+        return visited
+
+
+@contextmanager
+def migration_lock(engine):
+    """Hold the cross-process migration lock (blocks until other upgrades finish)"""
+    if engine.dialect.name == 'postgresql':
+        # Session-level lock on its own connection; migration steps use others
+        with engine.connect() as conn:
+            conn.execute(sa.text("SELECT pg_advisory_lock(:key)"), {'key': PG_LOCK_KEY})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(sa.text("SELECT pg_advisory_unlock(:key)"), {'key': PG_LOCK_KEY})
+                conn.commit()
+        return
+
+    database = engine.url.database
+    if engine.dialect.name != 'sqlite' or fcntl is None or database in (None, '', ':memory:'):
+        yield  # in-memory databases live in one process
+        return
+    if database.startswith('file:'):
+        database = database[len('file:'):].split('?')[0]
+    with open(f"{os.path.abspath(database)}.migrate-lock", 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def upgrade(engine, target=None, batch_size=500, log=print):
+    """
+    Apply pending migrations up to target (default: latest).
+
+    Returns:
+        list: versions applied (empty if another process applied them first)
+    """
+    with migration_lock(engine):
+        return _upgrade(engine, target, batch_size, log)
+
+
+def _upgrade(engine, target, batch_size, log):
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+    current = current_version(engine)  # read under the lock
+    ctx = MigrationContext(engine, batch_size=batch_size, log=log)
+    applied = []
+    for module in load_migrations():
+        if module.VERSION <= current or (target is not None and module.VERSION > target):
+            continue
+        name = migration_name(module)
+        log(f"Applying {module.VERSION:03d} {name} ...")
+        started = time.time()
+        module.upgrade(ctx)
+        with engine.begin() as conn:
+            conn.execute(schema_version.insert().values(
+                version=module.VERSION, name=name, applied_at=datetime.utcnow()
+            ))
+        log(f"  ✅ {module.VERSION:03d} done in {time.time() - started:.1f}s")
+        applied.append(module.VERSION)
+    return applied
+
+
+def status(engine):
+    """[(version, name, applied_at or None)] for every known migration"""
+    applied = {}
+    if current_version(engine):
+        with engine.connect() as conn:
+            applied = {row.version: row.applied_at for row in conn.execute(sa.select(schema_version))}
+    return [(m.VERSION, migration_name(m), applied.get(m.VERSION)) for m in load_migrations()]
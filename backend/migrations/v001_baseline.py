@@ -0,0 +1,71 @@
+"""
+Baseline schema (users, favorite_teams, saved_fixtures, login_logs)
+
+Creates the original tables on a fresh database and brings databases that
+predate the framework up to the same point: the columns once added by
+dev_scripts/migrate_filters.py, migrate_promo.py and migrate_logs.py, plus
+favorite_teams.is_national, which never had a script.
+
+Table definitions are frozen copies of the schema at this version; later
+migrations change it, never this file.
+"""
+import sqlalchemy as sa
+
+VERSION = 1
+
+meta = sa.MetaData()
+
+users = sa.Table(
+    'users', meta,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('username', sa.String(80), unique=True, nullable=False),
+    sa.Column('email', sa.String(120), unique=True, nullable=False),
+    sa.Column('password_hash', sa.String(255), nullable=False),
+    sa.Column('has_seen_sync_promo', sa.Boolean),
+    sa.Column('created_at', sa.DateTime),
+)
+
+favorite_teams = sa.Table(
+    'favorite_teams', meta,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id'), nullable=False),
+    sa.Column('team_id', sa.Integer, nullable=False),
+    sa.Column('team_name', sa.String(120), nullable=False),
+    sa.Column('team_logo', sa.String(255)),
+    sa.Column('filters', sa.Text),
+    sa.Column('is_national', sa.Boolean),
+    sa.Column('added_at', sa.DateTime),
+)
+
+saved_fixtures = sa.Table(
+    'saved_fixtures', meta,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id'), nullable=False),
+    sa.Column('fixture_id', sa.Integer, nullable=False),
+    sa.Column('fixture_data', sa.Text, nullable=False),
+    sa.Column('added_at', sa.DateTime),
+)
+
+login_logs = sa.Table(
+    'login_logs', meta,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('username', sa.String(80), nullable=False),
+    sa.Column('email', sa.String(120)),
+    sa.Column('status', sa.String(20), nullable=False),
+    sa.Column('ip_address', sa.String(50)),
+    sa.Column('timestamp', sa.DateTime),
+)
+
+# Columns older databases may be missing
+ADDED_COLUMNS = [
+    ('users', sa.Column('has_seen_sync_promo', sa.Boolean, server_default=sa.false())),
+    ('favorite_teams', sa.Column('filters', sa.Text)),
+    ('favorite_teams', sa.Column('is_national', sa.Boolean, server_default=sa.false())),
+]
+
+
+def upgrade(ctx):
+    for table in meta.sorted_tables:
+        ctx.create_table(table)
+    for table, column in ADDED_COLUMNS:
+        ctx.add_column(table, column)
@@ -0,0 +1,121 @@
+"""
+Shared fixture store (fixtures table, thin saved_fixtures)
+
+Creates `fixtures`, backfills it from the per-user saved_fixtures.fixture_data
+blobs in batches (newest copy of each fixture wins) and then drops the blob
+column. Replaces dev_scripts/migrate_fixture_store.py.
+"""
+import json
+from datetime import datetime
+import sqlalchemy as sa
+
+VERSION = 2
+
+meta = sa.MetaData()
+
+fixtures = sa.Table(
+    'fixtures', meta,
+    sa.Column('fixture_id', sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column('payload', sa.Text, nullable=False),
+    sa.Column('kickoff_at', sa.DateTime),
+    sa.Column('status', sa.String(10)),
+    sa.Column('home_team_id', sa.Integer),
+    sa.Column('away_team_id', sa.Integer),
+    sa.Column('league_id', sa.Integer),
+    sa.Column('league_type', sa.String(20)),
+    sa.Column('league_name', sa.String(120)),
+    sa.Column('goals_home', sa.Integer),
+    sa.Column('goals_away', sa.Integer),
+    sa.Column('updated_at', sa.DateTime),
+    sa.Column('refreshed_at', sa.DateTime),
+    sa.Column('vevent', sa.Text),
+)
+
+# Columns added to fixtures after its first release (pre-framework databases)
+ADDED_COLUMNS = [
+    sa.Column('refreshed_at', sa.DateTime),
+    sa.Column('vevent', sa.Text),
+]
+
+saved_fixtures = sa.table('saved_fixtures', sa.column('id'))
+
+
+def extract_row(payload, now):
+    """fixtures row values from a fixture JSON blob (same columns as Fixture.apply_payload)"""
+    f = json.loads(payload)
+    info = f.get('fixture') or {}
+    league = f.get('league') or {}
+    teams = f.get('teams') or {}
+    goals = f.get('goals') or {}
+
+    kickoff_at = None
+    if info.get('date'):
+        try:
+            kickoff = datetime.fromisoformat(info['date'].replace('Z', '+00:00'))
+            kickoff_at = datetime.utcfromtimestamp(kickoff.timestamp())
+        except ValueError:
+            pass
+
+    return {
+        'payload': json.dumps(f),
+        'kickoff_at': kickoff_at,
+        'status': (info.get('status') or {}).get('short'),
+        'home_team_id': (teams.get('home') or {}).get('id'),
+        'away_team_id': (teams.get('away') or {}).get('id'),
+        'league_id': league.get('id'),
+        'league_type': league.get('type'),
+        'league_name': league.get('name'),
+        'goals_home': goals.get('home'),
+        'goals_away': goals.get('away'),
+        'updated_at': now,
+        'refreshed_at': now,
+        'vevent': None,
+    }
+
+
+def move_batch(conn, rows):
+    """Upsert one batch of saved_fixtures blobs into fixtures; drop unparsable rows"""
+    now = datetime.utcnow()
+    latest = {}
+    unparsable = []
+    for saved_id, fixture_id, payload in rows:
+        try:
+            latest[fixture_id] = dict(extract_row(payload, now), fixture_id=fixture_id)
+        except Exception as e:
+            print(f"  ⚠️ Dropping unparsable saved fixture {saved_id} ({fixture_id}): {e}")
+            unparsable.append(saved_id)
+
+    existing = set(conn.execute(
+        sa.select(fixtures.c.fixture_id).where(fixtures.c.fixture_id.in_(list(latest)))
+    ).scalars())
+    inserts = [row for fid, row in latest.items() if fid not in existing]
+    updates = [{f"b_{c}": v for c, v in row.items()} for fid, row in latest.items() if fid in existing]
+    if inserts:
+        conn.execute(fixtures.insert(), inserts)
+    if updates:
+        columns = [c.name for c in fixtures.columns if c.name != 'fixture_id']
+        conn.execute(
+            fixtures.update()
+            .where(fixtures.c.fixture_id == sa.bindparam('b_fixture_id'))
+            .values({c: sa.bindparam(f"b_{c}") for c in columns}),
+            updates
+        )
+    if unparsable:
+        conn.execute(sa.delete(saved_fixtures).where(saved_fixtures.c.id.in_(unparsable)))
+
+
+def upgrade(ctx):
+    ctx.create_table(fixtures)
+    for column in ADDED_COLUMNS:
+        ctx.add_column('fixtures', column)
+
+    if 'fixture_data' in ctx.columns('saved_fixtures'):
+        moved = ctx.backfill('saved_fixtures', ['id', 'fixture_id', 'fixture_data'], move_batch)
+        ctx.log(f"  - Moved {moved} saved fixture blobs into the shared store")
+        ctx.drop_column('saved_fixtures', 'fixture_data')
+
+    if ctx.dialect != 'sqlite':  # SQLite can't add constraints to an existing table
+        fks = ctx.inspector().get_foreign_keys('saved_fixtures')
+        if not any(fk['referred_table'] == 'fixtures' for fk in fks):
+            ctx.execute("ALTER TABLE saved_fixtures ADD CONSTRAINT fk_saved_fixtures_fixture "
+                        "FOREIGN KEY (fixture_id) REFERENCES fixtures (fixture_id)")
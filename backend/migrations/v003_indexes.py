@@ -0,0 +1,41 @@
+"""
+Indexes and unique constraints for the hot query shapes
+
+Removes duplicate (user_id, fixture_id) saved fixtures and (user_id, team_id)
+favorites (oldest row wins), then builds the indexes declared in models.py.
+Replaces dev_scripts/migrate_indexes.py.
+"""
+
+VERSION = 3
+
+# Duplicates must go before the unique indexes can be built
+DEDUPLICATE = [
+    ('saved_fixtures', 'user_id, fixture_id'),
+    ('favorite_teams', 'user_id, team_id'),
+]
+
+# (name, table, columns, unique) - same names as the models' indexes
+INDEXES = [
+    ('ix_fixtures_home_team_id', 'fixtures', ['home_team_id'], False),
+    ('ix_fixtures_away_team_id', 'fixtures', ['away_team_id'], False),
+    ('uq_saved_fixtures_user_fixture', 'saved_fixtures', ['user_id', 'fixture_id'], True),
+    ('ix_saved_fixtures_user_added', 'saved_fixtures', ['user_id', 'added_at'], False),
+    ('ix_saved_fixtures_fixture_id', 'saved_fixtures', ['fixture_id'], False),
+    ('uq_favorite_teams_user_team', 'favorite_teams', ['user_id', 'team_id'], True),
+    ('ix_login_logs_timestamp', 'login_logs', ['timestamp'], False),
+    ('ix_login_logs_username_timestamp', 'login_logs', ['username', 'timestamp'], False),
+]
+
+
+def upgrade(ctx):
+    for table, columns in DEDUPLICATE:
+        result = ctx.execute(
+            f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {columns})"
+        )
+        if result.rowcount:
+            ctx.log(f"  - Removed {result.rowcount} duplicate {table} rows")
+
+    for name, table, columns, unique in INDEXES:
+        ctx.create_index(name, table, columns, unique=unique)
+
+    ctx.execute("ANALYZE")  # Give the planner row counts for the new indexes
@@ -0,0 +1,34 @@
+"""
+Shared sync job table (sync_jobs)
+
+Favorites sync jobs were tracked in one process's memory, so with several
+app workers a progress poll usually reached a process that didn't know the
+job. The table makes jobs visible to every process; a partial unique index
+keeps one unfinished job per user.
+"""
+import sqlalchemy as sa
+
+VERSION = 4
+
+meta = sa.MetaData()
+
+sync_jobs = sa.Table(
+    'sync_jobs', meta,
+    sa.Column('id', sa.String(32), primary_key=True),
+    sa.Column('user_id', sa.Integer, nullable=False),
+    sa.Column('status', sa.String(10), nullable=False),
+    sa.Column('teams_total', sa.Integer, nullable=False),
+    sa.Column('teams_done', sa.Integer, nullable=False),
+    sa.Column('fixtures_added', sa.Integer, nullable=False),
+    sa.Column('errors', sa.Text, nullable=False),
+    sa.Column('created_at', sa.DateTime),
+    sa.Column('updated_at', sa.DateTime),
+    sa.Column('finished_at', sa.DateTime),
+)
+
+
+def upgrade(ctx):
+    ctx.create_table(sync_jobs)
+    ctx.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_sync_jobs_active_user "
+                "ON sync_jobs (user_id) WHERE finished_at IS NULL")
+    ctx.create_index('ix_sync_jobs_finished_at', 'sync_jobs', ['finished_at'])
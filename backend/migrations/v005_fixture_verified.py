@@ -0,0 +1,20 @@
+"""
+Upstream-sourced fixtures (fixtures.verified) and escaped VEVENTs
+
+Shared team feeds only list fixtures whose payload came from the upstream
+API; rows seeded by /calendar/add payloads stay unverified. Which existing
+rows came from upstream isn't recorded, so all start unverified and are made
+due (refreshed_at NULL): the refresher and fan-out sync re-fetch them and
+verify the ones upstream returns.
+
+Stored VEVENTs are cleared so they are re-rendered with escaped text values.
+"""
+import sqlalchemy as sa
+
+VERSION = 5
+
+
+def upgrade(ctx):
+    if ctx.add_column('fixtures', sa.Column('verified', sa.Boolean, nullable=False, server_default=sa.false())):
+        ctx.execute("UPDATE fixtures SET refreshed_at = NULL")
+    ctx.execute("UPDATE fixtures SET vevent = NULL")
@@ -0,0 +1,15 @@
+"""
+Covering index for the admin log analysis
+
+analyze_logs groups login_logs by (username, email) and sums status, over a
+timestamp range or all time. An index on (username, email, timestamp, status)
+serves it in group order from the index alone, instead of a table scan into
+a temporary GROUP BY b-tree.
+"""
+
+VERSION = 6
+
+
+def upgrade(ctx):
+    ctx.create_index('ix_login_logs_username_email_timestamp_status', 'login_logs',
+                     ['username', 'email', 'timestamp', 'status'])
@@ -4,6 +4,8 @@ User and FavoriteTeam models
 """
 from extensions import db
 from datetime import datetime
+import json
+from services.filters import compile_filters
 
 class User(db.Model):
     """User model - stores user account information"""
@@ -33,6 +35,9 @@ class User(db.Model):
 class FavoriteTeam(db.Model):
     """FavoriteTeam model - stores user's favorite teams"""
     __tablename__ = 'favorite_teams'
+    __table_args__ = (
+        db.Index('uq_favorite_teams_user_team', 'user_id', 'team_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -43,6 +48,15 @@ class FavoriteTeam(db.Model):
     is_national = db.Column(db.Boolean, default=False)  # True for national teams
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @property
+    def filter_predicate(self):
+        """Compiled filters, recompiled only when the filters column changes"""
+        cached = self.__dict__.get('_filter_predicate')
+        if cached is None or cached[0] != self.filters:
+            cached = (self.filters, compile_filters(self.filters))
+            self.__dict__['_filter_predicate'] = cached
+        return cached[1]
+    
     def to_dict(self):
         """Convert favorite team to dictionary"""
         import json as _json
@@ -59,6 +73,11 @@ class FavoriteTeam(db.Model):
 class LoginLog(db.Model):
     """LoginLog model - tracks user login attempts"""
     __tablename__ = 'login_logs'
+    __table_args__ = (
+        db.Index('ix_login_logs_timestamp', 'timestamp'),
+        db.Index('ix_login_logs_username_timestamp', 'username', 'timestamp'),
+        db.Index('ix_login_logs_username_email_timestamp_status', 'username', 'email', 'timestamp', 'status'),  # admin.analyze_logs
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), nullable=False)
@@ -67,16 +86,106 @@ class LoginLog(db.Model):
     ip_address = db.Column(db.String(50), nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+class Fixture(db.Model):
+    """Fixture model - one shared copy of each API fixture, referenced by every subscriber"""
+    __tablename__ = 'fixtures'
+    
+    fixture_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    payload = db.Column(db.Text, nullable=False) # Latest JSON string of match details
+    
+    # Hot columns extracted from payload
+    kickoff_at = db.Column(db.DateTime)  # UTC
+    status = db.Column(db.String(10))    # 'NS', '1H', 'FT', 'PST', ...
+    home_team_id = db.Column(db.Integer, index=True)
+    away_team_id = db.Column(db.Integer, index=True)
+    league_id = db.Column(db.Integer)
+    league_type = db.Column(db.String(20))  # 'League' or 'Cup'
+    league_name = db.Column(db.String(120))
+    goals_home = db.Column(db.Integer)
+    goals_away = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)    # Last payload change
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)  # Last upstream check (ahead = backing off)
+    vevent = db.Column(db.Text)  # Rendered ICS VEVENT block (NULL = re-render on next feed build)
+    verified = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # Payload came from upstream, not a client
+    
+    @property
+    def data(self):
+        """Parsed fixture payload"""
+        return json.loads(self.payload)
+    
+    def apply_payload(self, fixture):
+        """Store a fresh API fixture object. Returns True if anything changed."""
+        payload = json.dumps(fixture)
+        if payload == self.payload:
+            return False
+        
+        info = fixture.get('fixture') or {}
+        league = fixture.get('league') or {}
+        teams = fixture.get('teams') or {}
+        goals = fixture.get('goals') or {}
+        
+        kickoff_at = None
+        if info.get('date'):
+            try:
+                kickoff = datetime.fromisoformat(info['date'].replace('Z', '+00:00'))
+                kickoff_at = datetime.utcfromtimestamp(kickoff.timestamp())
+            except ValueError:
+                pass
+        
+        self.payload = payload
+        self.kickoff_at = kickoff_at
+        self.status = (info.get('status') or {}).get('short')
+        self.home_team_id = (teams.get('home') or {}).get('id')
+        self.away_team_id = (teams.get('away') or {}).get('id')
+        self.league_id = league.get('id')
+        self.league_type = league.get('type')
+        self.league_name = league.get('name')
+        self.goals_home = goals.get('home')
+        self.goals_away = goals.get('away')
+        self.updated_at = self.refreshed_at = datetime.utcnow()
+        self.vevent = None
+        return True
+
 class SavedFixture(db.Model):
-    """SavedFixture model - stores specific matches for calendar export"""
+    """SavedFixture model - links a user to a shared Fixture for calendar export"""
     __tablename__ = 'saved_fixtures'
+    __table_args__ = (
+        db.Index('uq_saved_fixtures_user_fixture', 'user_id', 'fixture_id', unique=True),
+        db.Index('ix_saved_fixtures_user_added', 'user_id', 'added_at'),
+        db.Index('ix_saved_fixtures_fixture_id', 'fixture_id'),  # subscribers of a fixture
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    fixture_id = db.Column(db.Integer, nullable=False)
-    fixture_data = db.Column(db.Text, nullable=False) # JSON string of match details
+    fixture_id = db.Column(db.Integer, db.ForeignKey('fixtures.fixture_id'), nullable=False)
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Backref from User
     user = db.relationship('User', backref=db.backref('saved_fixtures', lazy=True))
+    fixture = db.relationship('Fixture', lazy='joined')
+    
+    @property
+    def fixture_data(self):
+        """JSON string of match details (read from the shared fixture store)"""
+        return self.fixture.payload if self.fixture else None
 
+class SyncJob(db.Model):
+    """SyncJob model - progress of a background favorites sync, readable from any app process"""
+    __tablename__ = 'sync_jobs'
+    __table_args__ = (
+        # At most one unfinished job per user, across processes
+        db.Index('uq_sync_jobs_active_user', 'user_id', unique=True,
+                 sqlite_where=db.text('finished_at IS NULL'), postgresql_where=db.text('finished_at IS NULL')),
+        db.Index('ix_sync_jobs_finished_at', 'finished_at'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, nullable=False)  # No FK: rows outlive a deleted user until pruned
+    status = db.Column(db.String(10), nullable=False)  # 'queued', 'running', 'done', 'failed'
+    teams_total = db.Column(db.Integer, nullable=False, default=0)
+    teams_done = db.Column(db.Integer, nullable=False, default=0)
+    fixtures_added = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text, nullable=False, default='[]')  # JSON list of messages
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # last progress report
+    finished_at = db.Column(db.DateTime)
@@ -8,6 +8,7 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from flask_mail import Message
 from extensions import db, jwt, mail
 from models import User, LoginLog
+from services.identity import identity_cache, Identity
 from datetime import timedelta
 import os
 import textwrap
@@ -42,6 +43,10 @@ def register():
     if not data or not data.get('username') or not data.get('email') or not data.get('password'):
         return jsonify({'error': 'Missing required fields: username, email, password'}), 400
     
+    # The username is the feed URL's last path segment
+    if '/' in data['username']:
+        return jsonify({'error': "Username can't contain '/'"}), 400
+    
     # Validate password strength
     is_valid, error_msg = _validate_password(data['password'])
     if not is_valid:
@@ -65,6 +70,7 @@ def register():
     db.session.commit()
     
     access_token = create_access_token(identity=str(user.id))
+    identity_cache.put(Identity(user.id, user.username))  # The client's next requests skip the users lookup
     
     return jsonify({
         'message': 'User created successfully',
@@ -126,6 +132,7 @@ def login():
         db.session.rollback()
     
     access_token = create_access_token(identity=str(user.id))
+    identity_cache.put(Identity(user.id, user.username))  # The client's next requests skip the users lookup
     
     return jsonify({
         'message': 'Login successful',
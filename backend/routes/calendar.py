@@ -2,23 +2,26 @@
 Calendar Routes
 Handles calendar entry creation and ICS feed generation
 """
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, abort, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm.attributes import set_committed_value
 from extensions import db
-from models import User, SavedFixture
-from services.football_service import FootballAPI
-import json
-import os
-import time
-from datetime import datetime
+from models import User, Fixture, SavedFixture
+from services.fixture_store import (upsert_fixtures, save_for_user, persist_fragments,
+                                    team_feed_filter, team_feed_state, team_feed_version)
+from services.filters import compile_filters
+from services.db_profile import read_session, renew_statement_deadline
+from services.identity import current_identity
+from services.ics_renderer import fixture_fragment, stream_calendar
+from services import feed_cache
+from services.feed_cache import invalidate as _invalidate_cache
+from config import FEED_STALE_WAIT, FEED_STREAM_BATCH, FEED_LARGE_BYTES
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import wrap_file
+from datetime import datetime, timezone
+import hashlib
 
 calendar_bp = Blueprint('calendar', __name__)
-football_service = FootballAPI()
-
-# Cache Configuration
-CACHE_DIR = os.path.join(os.getcwd(), 'instance', 'cache')
-os.makedirs(CACHE_DIR, exist_ok=True)
-CACHE_DURATION = 6 * 3600  # 6 Hours in seconds
 
 @calendar_bp.route('/calendar/add', methods=['POST'])
 @jwt_required()
@@ -26,32 +29,22 @@ def add_to_calendar():
     """
     Save selected fixtures to user's calendar
     """
-    current_user_id = get_jwt_identity()
+    user = current_identity(confirm=True)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
     data = request.get_json()
     
     if not data or not data.get('fixtures'):
         return jsonify({'error': 'No fixtures provided'}), 400
         
     fixtures = data['fixtures'] # List of fixture objects
-    saved_count = 0
-    
-    for f in fixtures:
-        fid = f['fixture']['id']
-        # Check if exists
-        exists = SavedFixture.query.filter_by(user_id=current_user_id, fixture_id=fid).first()
-        if not exists:
-            new_entry = SavedFixture(
-                user_id=current_user_id, 
-                fixture_id=fid,
-                fixture_data=json.dumps(f)
-            )
-            db.session.add(new_entry)
-            saved_count += 1
-            
+    
+    # Seed the shared store with fixtures we haven't seen (never overwrite upstream data)
+    stored, _ = upsert_fixtures(fixtures, overwrite=False)
+    saved_count = len(save_for_user(user.id, list(stored)))
     db.session.commit()
     
     # Invalidate Cache on update so user sees changes immediately
-    user = User.query.get(current_user_id)
     _invalidate_cache(user.username)
     
     # Generate the sync URL
@@ -67,12 +60,13 @@ def add_to_calendar():
 def get_calendar_events():
     """Get all saved events for the user"""
     current_user_id = get_jwt_identity()
-    saved = SavedFixture.query.filter_by(user_id=current_user_id).order_by(SavedFixture.added_at.desc()).all()
+    saved = read_session().query(SavedFixture).filter_by(user_id=current_user_id) \
+        .options(db.joinedload(SavedFixture.fixture)).order_by(SavedFixture.added_at.desc()).all()
     
     events = []
     for s in saved:
         try:
-            data = json.loads(s.fixture_data)
+            data = s.fixture.data
             events.append({
                 'id': s.id, # The DB ID, not fixture ID
                 'fixture_id': s.fixture_id,
@@ -89,14 +83,13 @@ def get_calendar_events():
 @jwt_required()
 def delete_calendar_event(db_id):
     """Delete a specific event"""
-    current_user_id = get_jwt_identity()
-    event = SavedFixture.query.filter_by(id=db_id, user_id=current_user_id).first()
+    user = current_identity()
+    event = SavedFixture.query.filter_by(id=db_id, user_id=user.id).first() if user else None
     
     if event:
         db.session.delete(event)
         db.session.commit()
         # Invalidate cache
-        user = User.query.get(current_user_id)
         _invalidate_cache(user.username)
         return jsonify({'success': True}), 200
     return jsonify({'error': 'Event not found'}), 404
@@ -105,142 +98,234 @@ def delete_calendar_event(db_id):
 @jwt_required()
 def clear_calendar():
     """Clear all events for user"""
-    current_user_id = get_jwt_identity()
-    SavedFixture.query.filter_by(user_id=current_user_id).delete()
+    user = current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    SavedFixture.query.filter_by(user_id=user.id).delete()
     db.session.commit()
     
-    user = User.query.get(current_user_id)
     _invalidate_cache(user.username)
     
     return jsonify({'success': True}), 200
 
-def _invalidate_cache(username):
-    cache_path = os.path.join(CACHE_DIR, f"{username}.ics")
-    if os.path.exists(cache_path):
-        try:
-            os.remove(cache_path)
-        except:
-             pass
+def _feed_response(filename, entry):
+    """
+    Serve a cached feed with validators, answering 304 without touching the
+    body when possible. Compressed variants are pre-built at store time.
+    """
+    encoding = request.accept_encodings.best_match(list(feed_cache.ENCODINGS))
+    # Each representation gets its own strong ETag
+    etag = f"{entry['etag']}-{encoding}" if encoding else entry['etag']
+    last_modified = datetime.fromtimestamp(int(entry['last_modified']), tz=timezone.utc)
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    else:
+        if entry.get('body') is None and entry['size'] >= FEED_LARGE_BYTES:
+            # Too big to load whole: send the cached file in blocks
+            body = feed_cache.open_file(entry, encoding) if encoding else None
+            if body is None:
+                encoding, etag = None, entry['etag']
+                body = feed_cache.open_file(entry)
+            if body is None:
+                abort(503)  # Rewritten under us; the next poll gets the new copy
+            body = wrap_file(request.environ, body)
+        else:
+            body = feed_cache.read(entry, encoding) if encoding else None
+            if body is None:
+                encoding, etag = None, entry['etag']
+                body = feed_cache.read(entry)
+        response = Response(
+            body,
+            mimetype="text/calendar",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+        if encoding:
+            response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    # A stale copy is being replaced: don't let clients or proxies keep it
+    response.cache_control.max_age = 0 if entry.get('stale') else feed_cache.FEED_MAX_AGE
+    return response
+
+def _feed_user_id(username):
+    """Id of the feed's owner, or None for unknown users"""
+    return read_session().query(User.id).filter_by(username=username).scalar()
+
+def _stream_fixtures(query, include=None):
+    """
+    Stream an ICS feed of the fixtures selected by query, one chunk per batch
+    of FEED_STREAM_BATCH rows (read through a server-side cursor), so memory
+    use doesn't grow with the size of the calendar.
+    
+    include: optional predicate (a FilterPredicate) deciding which fixtures to keep
+    """
+    session = read_session()
+    # Fragments are pre-rendered: the JSON payload is only selected (in the
+    # same query) for rows that still need rendering
+    pending_payload = db.case((Fixture.vevent.is_(None), Fixture.payload))
+    query = query.add_columns(pending_payload).options(db.defer(Fixture.payload)) \
+        .execution_options(yield_per=FEED_STREAM_BATCH)
+    rendered_any = False
+    
+    def batches():
+        nonlocal rendered_any
+        for rows in session.execute(query).partitions():
+            fixtures, unrendered = [], []
+            for fixture, payload in rows:
+                if include is not None and not include.matches(fixture.league_type, fixture.league_name):
+                    continue
+                if fixture.vevent is None:
+                    set_committed_value(fixture, 'payload', payload)
+                    unrendered.append(fixture)
+                fixtures.append(fixture)
+            fragments = [fixture_fragment(f) for f in fixtures]
+            if unrendered:
+                _persist_rendered(session, unrendered)
+                rendered_any = True
+            yield fragments
+            renew_statement_deadline(session)  # The timeout bounds each batch, not the whole feed
+    
+    yield from stream_calendar(batches())
+    if rendered_any and session is db.session:
+        db.session.commit()
+
+def _persist_rendered(session, fixtures):
+    """
+    Save one batch's first-time renders (always on the primary) and let the
+    rows go, so a feed build's memory stays flat however many need rendering.
+    """
+    if session is db.session:
+        db.session.flush()  # Committed once the cursor is done
+        return
+    persist_fragments(fixtures)
+    db.session.commit()
+    for fixture in fixtures:
+        session.expunge(fixture)  # Modified rows are held by the read session until expunged
+
+def _feed_chunks(user_id):
+    """Stream a user's ICS feed from their saved fixtures"""
+    return _stream_fixtures(
+        db.select(Fixture)
+        .join(SavedFixture, SavedFixture.fixture_id == Fixture.fixture_id)
+        .where(SavedFixture.user_id == user_id)
+        .order_by(SavedFixture.id)
+    )
+
+def _feed_renderer(username):
+    """Feed chunks for a rebuild worker: looked up and streamed in their own app context"""
+    app = current_app._get_current_object()
+    
+    def chunks(user_id):
+        with app.app_context():
+            yield from _feed_chunks(user_id)
+    
+    def render():
+        with app.app_context():
+            user_id = _feed_user_id(username)
+        return None if user_id is None else chunks(user_id)
+    return render
 
 @calendar_bp.route('/sync/MatchDayByTM/<username>.ics')
 def get_ics_feed(username):
     """
     Public ICS feed endpoint - Optimized with Caching
+    
+    Only reads local data: fixtures are kept fresh by the background
+    FixtureRefresher, which also invalidates affected feeds. Responses carry
+    a strong ETag and Last-Modified, so unchanged polls get a 304.
+    
+    A feed is rebuilt once per user at a time. While an expired/invalidated
+    feed is rebuilt, polls get the previous copy if the rebuild takes longer
+    than FEED_STALE_WAIT; only a user without any cached feed waits for it.
+    Rebuilds read and write the calendar in batches instead of building it
+    in memory.
+    """
+    return _serve_feed(username, f"{username}_MatchDayByTM.ics", _feed_renderer(username))
+
+def _serve_feed(key, filename, render, tag=None):
+    """
+    Serve cached feed `key`, rebuilding it with render() when needed.
+    
+    Args:
+        render: rebuild callable for feed_cache.rebuild (returns None if
+            the feed no longer exists: 404)
+        tag: version of the data the feed is built from; a cached copy with
+            another tag is served stale while it's rebuilt
     """
     # 1. Check Cache
-    cache_path = os.path.join(CACHE_DIR, f"{username}.ics")
-    if os.path.exists(cache_path):
-        file_age = time.time() - os.path.getmtime(cache_path)
-        if file_age < CACHE_DURATION:
-            # Serve Cached File
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                return Response(
-                    content,
-                    mimetype="text/calendar",
-                    headers={"Content-Disposition": f"attachment; filename={username}_MatchDayByTM.ics"}
-                )
-
-    # 2. Logic: If cache missing or expired, regenerate
-    user = User.query.filter_by(username=username).first_or_404()
-    saved_items = SavedFixture.query.filter_by(user_id=user.id).all()
-    
-    if not saved_items:
-        return Response("BEGIN:VCALENDAR\nVERSION:2.0\nEND:VCALENDAR", mimetype="text/calendar")
-
-    # 3. Fetch Fresh Data (Optimization: use IDs to batch fetch)
-    fixture_ids = [item.fixture_id for item in saved_items]
-    fresh_fixtures = football_service.get_fixtures_by_ids(fixture_ids)
-    
-    # Map by ID for easy lookup
-    fixtures_map = {f['fixture']['id']: f for f in fresh_fixtures}
-
-    # 4. Build ICS content
-    ics_content = [
-        "BEGIN:VCALENDAR",
-        "VERSION:2.0",
-        "PRODID:-//Match Calendar//MatchDayByTM//EN",
-        "X-WR-CALNAME:MatchDayByTM",
-        "CALSCALE:GREGORIAN", 
-        "METHOD:PUBLISH"
-    ]
-    
-    for item in saved_items:
+    entry = feed_cache.lookup(key, allow_stale=True)
+    if entry and tag is not None and entry.get('tag') != tag and not entry.get('stale'):
+        # Built from older data
+        feed_cache.invalidate(key)
+        entry = dict(entry, stale=True)
+    if entry and not entry.get('stale'):
+        return _feed_response(filename, entry)
+
+    if entry:
+        # 2a. Stale: rebuild off the request thread, serve the old copy meanwhile
+        future = feed_cache.rebuild_in_background(key, render, tag)
         try:
-            # Use fresh data if available, else fallback to stale DB data
-            f = fixtures_map.get(item.fixture_id)
-            if not f:
-                 f = json.loads(item.fixture_data)
-            
-            # Format dates
-            dt_str = f['fixture']['date'] # ISO string
-            dt_obj = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
-            
-            # ICS format: YYYYMMDDTHHMMSSZ
-            start_str = dt_obj.strftime('%Y%m%dT%H%M%SZ')
-            # Assume 2 hours duration
-            end_ts = dt_obj.timestamp() + 7200 
-            end_obj = datetime.fromtimestamp(end_ts)
-            end_str = end_obj.strftime('%Y%m%dT%H%M%SZ')
-            
-            now_str = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-            
-            uid = f"{f['fixture']['id']}@matchdaybytm"
-            
-            # Add Status to summary if LIVE or FT
-            status = f['fixture']['status']['short']
-            score = ""
-            status_prefix = ""
-
-            if status == 'PST':
-                status_prefix = "⚠️ POSTPONED: "
-            elif status in ['FT', '1H', '2H', 'HT']:
-                score = f" [{f['goals']['home']}-{f['goals']['away']}]"
-            
-            summary = f"{status_prefix}⚽ {f['teams']['home']['name']} vs {f['teams']['away']['name']}{score}"
-            
-            # Location Logic (Venue + City)
-            venue = f['fixture']['venue'].get('name') or "TBA"
-            city = f['fixture']['venue'].get('city')
-            location = f"{venue}, {city}" if city and venue != "TBA" else venue
+            rebuilt = future.result(timeout=FEED_STALE_WAIT)
+        except Exception:
+            rebuilt = entry  # Still running (or failed): stale-while-revalidate
+        if rebuilt is None:
+            abort(404)  # Feed no longer exists
+        return _feed_response(filename, rebuilt)
 
-            description = f"{f['league']['name']} - {location}"
-            
-            ics_content.extend([
-                "BEGIN:VEVENT",
-                f"UID:{uid}",
-                f"DTSTAMP:{now_str}",
-                f"DTSTART:{start_str}",
-                f"DTEND:{end_str}",
-                f"SUMMARY:{summary}",
-                f"DESCRIPTION:{description}",
-                f"LOCATION:{location}",
-                f"STATUS:{'CANCELLED' if status == 'PST' else 'CONFIRMED'}",
-                "END:VEVENT"
-            ])
-            
-            # Update DB record with fresh data (Optional, keeps DB fresh)
-            if f != json.loads(item.fixture_data):
-                item.fixture_data = json.dumps(f)
-                
-        except Exception as e:
-            print(f"Error parsing fixture {item.id}: {e}")
-            continue
+    # 2b. Nothing cached: rebuild once, concurrent polls wait and share it.
+    # The rebuild writes the cache file at database speed and the response is
+    # sent from that file, so a slow client holds neither a cursor nor the rebuild.
+    entry = feed_cache.rebuild(key, render, tag)
+    if entry is None:
+        abort(404)
+    return _feed_response(filename, entry)
+
+def _team_feed_key(team_id, include, leagues):
+    """
+    Cache key of a team feed: one per team and set of its stored leagues the
+    filters select, not per filters string, so arbitrary ?filters= values
+    can't grow the cache past the subsets of the team's leagues.
+    """
+    selected = sorted(f"{league_type}/{league_name}" for league_type, league_name in leagues
+                      if include.matches(league_type, league_name))
+    if len(selected) == len(leagues):
+        return f"teams/{team_id}/all"
+    digest = hashlib.sha1('\n'.join(selected).encode('utf-8')).hexdigest()[:12]
+    return f"teams/{team_id}/{digest}"
+
+@calendar_bp.route('/sync/team/<int:team_id>.ics')
+def get_team_feed(team_id):
+    """
+    Public shared team feed: every upstream-sourced fixture of a team, optionally
+    narrowed with ?filters=League,Cup,Champions League (same filters as a
+    favorite team subscription).
     
-    ics_content.append("END:VCALENDAR")
-    final_ics = "\n".join(ics_content)
-    
-    # 5. Save to Cache
-    try:
-        with open(cache_path, 'w', encoding='utf-8') as f:
-            f.write(final_ics)
-        # Verify update
-        db.session.commit() 
-    except Exception as e:
-        print(f"Cache write error: {e}")
-
-    return Response(
-        final_ics,
-        mimetype="text/calendar",
-        headers={"Content-Disposition": f"attachment; filename={username}_MatchDayByTM.ics"}
-    )
+    Rendered once from the shared fixture store and cached as a single
+    feed per team and selected leagues, whatever the number of subscribers.
+    Each poll runs one indexed query for the version and leagues of the
+    team's fixtures; the cached copy is rebuilt (stale-while-revalidate) when
+    the version changes.
+    """
+    filters = [f.strip() for f in request.args.get('filters', '').split(',') if f.strip()]
+    include = compile_filters(sorted(set(filters)))
+    version, leagues = team_feed_state(team_id, read_session())
+    if version is None:
+        abort(404)  # No fixtures stored for this team
+    key = _team_feed_key(team_id, include, leagues)
+    query = db.select(Fixture).where(team_feed_filter(team_id)) \
+        .order_by(Fixture.kickoff_at, Fixture.fixture_id)
+    app = current_app._get_current_object()
+    
+    def chunks():
+        with app.app_context():
+            yield from _stream_fixtures(query, include)
+    
+    def render():
+        with app.app_context():
+            known = team_feed_version(team_id, read_session()) is not None
+        return chunks() if known else None
+    
+    return _serve_feed(key, f"team_{team_id}_MatchDayByTM.ics", render, tag=version)
@@ -1,63 +1,29 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
 from extensions import db
-from models import User, FavoriteTeam, SavedFixture
+from models import FavoriteTeam
 from services.football_service import football_api
+from services.fixture_store import upsert_fixtures, save_for_user, remove_team_for_user
+from services.feed_cache import invalidate as _invalidate_cache
+from services.sync_jobs import sync_jobs
+from services.identity import current_identity, load_identity, confirm_identity
 import json
-import os
 
 favorites_bp = Blueprint('favorites', __name__)
 
-# Cache Configuration (Must match calendar.py)
-CACHE_DIR = os.path.join(os.getcwd(), 'instance', 'cache')
-
-def _should_include_fixture(fixture, filters):
-    """
-    Determine if a fixture should be included based on user's filter preferences.
-    
-    Args:
-        fixture: API fixture object with 'league' containing 'type' and 'name'
-        filters: List of filter strings like ['League', 'Cup', 'Champions League'] or None
-    
-    Returns:
-        bool: True if fixture should be included
-    """
-    if not filters:
-        return True  # No filters = include all
-    
-    if 'All' in filters:
-        return True
-    
-    league_type = fixture['league']['type']  # "League" or "Cup"
-    league_name = fixture['league']['name']
-    
-    # Check type matches
-    if 'League' in filters and league_type == 'League':
-        return True
-    if 'Cup' in filters and league_type == 'Cup':
-        return True
-    
-    # Check specific league name matches (e.g., "Champions League")
-    for keyword in filters:
-        if keyword not in ('League', 'Cup', 'All') and keyword in league_name:
-            return True
-    
-    return False
-
 @favorites_bp.route('/', methods=['GET'], strict_slashes=False)
 @jwt_required()
 def get_favorites():
     """Get all favorite teams for the current user"""
     try:
-        current_identity = get_jwt_identity()
-        user_id = int(current_identity)
-        user = User.query.get(user_id)
+        user = current_identity()
         
         if not user:
             # If token is valid but user deleted
             return jsonify({'error': 'User not found', 'favorites': []}), 404
         
-        favorites = [fav.to_dict() for fav in user.favorite_teams]
+        favorites = [fav.to_dict() for fav in FavoriteTeam.query.filter_by(user_id=user.id)]
         return jsonify({'favorites': favorites}), 200
     except Exception as e:
         print(f"Error in get_favorites: {e}")
@@ -73,7 +39,7 @@ def add_favorite():
     if not data or not data.get('team_id') or not data.get('team_name'):
         return jsonify({'error': 'Missing team_id or team_name'}), 400
     
-    user = User.query.get(user_id)
+    user = current_identity(confirm=True)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -107,7 +73,13 @@ def add_favorite():
         is_national=data.get('is_national', False)
     )
     db.session.add(favorite)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request subscribed the same team first
+        db.session.rollback()
+        existing = FavoriteTeam.query.filter_by(user_id=user_id, team_id=data['team_id']).first()
+        return jsonify({'message': 'Subscription updated', 'favorite': existing.to_dict()}), 200
     
     # 2. Auto-Add Upcoming Fixtures to Calendar
     added_count = 0
@@ -115,34 +87,16 @@ def add_favorite():
         # Fetch next 10 games
         api_res = football_api.get_fixtures_by_team(data['team_id'], next_n=10)
         fixtures = api_res.get('response', []) if isinstance(api_res, dict) else []
-        
-        for f in fixtures:
-            # Filter Logic - use shared helper
-            if not _should_include_fixture(f, filters):
-                continue
-
-            fid = f['fixture']['id']
-            # Check for duplicates
-            exists = SavedFixture.query.filter_by(user_id=user_id, fixture_id=fid).first()
-            if not exists:
-                new_entry = SavedFixture(
-                    user_id=user_id, 
-                    fixture_id=fid,
-                    fixture_data=json.dumps(f)
-                )
-                db.session.add(new_entry)
-                added_count += 1
-                
+        # Filter Logic - use shared helper
+        include = favorite.filter_predicate
+        fixtures = [f for f in fixtures if include(f)]
+        if not confirm_identity(user_id):
+            raise ValueError('User not found')  # Deleted while the API was called
+        stored, _ = upsert_fixtures(fixtures)
+        added_count = len(save_for_user(user_id, list(stored)))
+        db.session.commit()
         if added_count > 0:
-            db.session.commit()
-            
-            # Invalidate Cache
-            cache_path = os.path.join(CACHE_DIR, f"{user.username}.ics")
-            if os.path.exists(cache_path):
-                try:
-                    os.remove(cache_path)
-                except:
-                    pass
+            _invalidate_cache(user.username)
     except Exception as e:
         print(f"Error auto-syncing calendar: {e}")
     
@@ -166,20 +120,9 @@ def remove_favorite(team_id):
     if not favorite:
         return jsonify({'error': 'Favorite not found'}), 404
     
-    # Remove associated saved fixtures from calendar
+    # Remove associated saved fixtures from calendar (home or away, indexed)
     try:
-        saved_fixtures = SavedFixture.query.filter_by(user_id=user_id).all()
-        start_count = len(saved_fixtures)
-        for saf in saved_fixtures:
-            try:
-                data = json.loads(saf.fixture_data)
-                # Check if this fixture involves the team being removed
-                if (data['teams']['home']['id'] == team_id or 
-                    data['teams']['away']['id'] == team_id):
-                    db.session.delete(saf)
-            except Exception as e:
-                print(f"Error parsing fixture data for cleanup: {e}")
-                continue
+        remove_team_for_user(int(user_id), team_id)
     except Exception as e:
         print(f"Error cleaning up fixtures: {e}")
 
@@ -187,13 +130,9 @@ def remove_favorite(team_id):
     db.session.commit()
     
     # Invalidate cache
-    user = User.query.get(user_id)
-    cache_path = os.path.join(CACHE_DIR, f"{user.username}.ics")
-    if os.path.exists(cache_path):
-        try:
-            os.remove(cache_path)
-        except:
-            pass
+    user = current_identity()
+    if user:
+        _invalidate_cache(user.username)
     
     return jsonify({'message': 'Team removed from favorites and calendar cleaned'}), 200
 
@@ -201,19 +140,22 @@ def remove_favorite(team_id):
 @jwt_required()
 def get_favorite_matches():
     """Get all matches for favorite teams"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    if not user.favorite_teams:
+    favorites = FavoriteTeam.query.filter_by(user_id=user.id).all()
+    if not favorites:
         return jsonify({'matches': []}), 200
     
     all_matches = []
     
+    # Fetch every team's next 10 games concurrently
+    batch = football_api.fetch_fixtures_for_teams([fav.team_id for fav in favorites], next_n=10)
+    
     import json as _json
-    for fav_team in user.favorite_teams:
+    for fav_team in favorites:
         filters = fav_team.filters
         league_filter = None
         if filters:
@@ -229,72 +171,119 @@ def get_favorite_matches():
                             league_filter = f
             except Exception:
                 pass
-        fixtures = football_api.get_fixtures_by_team(fav_team.team_id, next_n=10)
-        matches = fixtures.get('response', []) if isinstance(fixtures, dict) else []
+        matches = batch['fixtures'].get(fav_team.team_id, [])
         # If league_filter is set, filter matches
         if league_filter:
             matches = [m for m in matches if m.get('league', {}).get('name') == league_filter]
         all_matches.extend(matches)
     # Sort by date
     all_matches.sort(key=lambda x: x['fixture']['date'])
-    return jsonify({'matches': all_matches}), 200
+    return jsonify({
+        'matches': all_matches,
+        'timed_out_teams': batch['timed_out'],
+        'failed_teams': batch['failed']
+    }), 200
 
-@favorites_bp.route('/sync', methods=['POST'])
-@jwt_required()
-def sync_favorites():
-    """Manually re-sync fixtures for all favorite teams"""
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-    
+def _sync_user_fixtures(user_id, job=None):
+    """
+    Re-sync fixtures for all of a user's favorite teams (needs an app context).
+    Reports progress on job when given. Returns (total_added, team batch).
+    """
+    user = load_identity(user_id)
     if not user:
-        return jsonify({'error': 'User not found'}), 404
+        raise ValueError('User not found')
         
-    favorites = user.favorite_teams
-    total_added = 0
+    favorites = FavoriteTeam.query.filter_by(user_id=user.id).all()
+    wanted = []
+    if job:
+        sync_jobs.update(job, teams_total=len(favorites))
+    
+    def on_team_done(team_id, fixtures):
+        if job:
+            sync_jobs.update(job, teams_done=job['teams_done'] + 1)
+    
+    # Fetch next 10 games for every team concurrently
+    batch = football_api.fetch_fixtures_for_teams(
+        [fav.team_id for fav in favorites], next_n=10, on_result=on_team_done
+    )
     
     for fav in favorites:
         try:
-            # Re-parse filters
-            filters = json.loads(fav.filters) if fav.filters else []
-            
-            # Fetch next 10 games
-            api_res = football_api.get_fixtures_by_team(fav.team_id, next_n=10)
-            fixtures = api_res.get('response', []) if isinstance(api_res, dict) else []
-            
-            for f in fixtures:
-                # Use shared filter logic
-                if not _should_include_fixture(f, filters):
-                    continue
-
-                # Check if exists
-                fixture_id = f['fixture']['id']
-                exists = SavedFixture.query.filter_by(
-                    user_id=user.id, 
-                    fixture_id=fixture_id
-                ).first()
-                
-                if not exists:
-                    new_fixture = SavedFixture(
-                        user_id=user.id,
-                        fixture_id=fixture_id,
-                        fixture_data=json.dumps(f)
-                    )
-                    db.session.add(new_fixture)
-                    total_added += 1
+            fixtures = batch['fixtures'].get(fav.team_id, [])
+            # Use the subscription's compiled filters
+            include = fav.filter_predicate
+            wanted.extend(f for f in fixtures if include(f))
                     
         except Exception as e:
             print(f"Error syncing team {fav.team_id}: {e}")
+            if job:
+                sync_jobs.update(job, error=f'Team {fav.team_id}: {e}')
             continue
 
     try:
+        if not confirm_identity(user_id):
+            raise ValueError('User not found')  # Deleted while the API was called
+        # One lookup + one batched insert for all teams
+        stored, _ = upsert_fixtures(wanted)
+        total_added = len(save_for_user(user.id, list(stored)))
         db.session.commit()
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        return jsonify({'error': 'Database error during sync', 'details': str(e)}), 500
+        raise
 
-    return jsonify({
-        'success': True, 
-        'message': f'Sync complete. Added {total_added} new fixtures.',
-        'total_added': total_added
-    }), 200
+    if total_added > 0:
+        _invalidate_cache(user.username)
+    return total_added, batch
+
+@favorites_bp.route('/sync', methods=['POST'])
+@jwt_required()
+def sync_favorites():
+    """
+    Queue a re-sync of fixtures for all favorite teams.
+    
+    Returns 202 with a job id immediately; poll GET /sync/<job_id> for progress.
+    Repeated clicks while a sync is running return the same job.
+    """
+    user_id = int(get_jwt_identity())
+    
+    if not current_identity(confirm=True):
+        return jsonify({'error': 'User not found'}), 404
+    
+    app = current_app._get_current_object()
+    
+    def work(job):
+        with app.app_context():
+            total_added, batch = _sync_user_fixtures(user_id, job)
+            sync_jobs.update(job, fixtures_added=total_added)
+            for team_id in batch['timed_out']:
+                sync_jobs.update(job, error=f'Team {team_id}: timed out')
+            for team_id in batch['failed']:
+                sync_jobs.update(job, error=f'Team {team_id}: upstream error')
+    
+    job, created = sync_jobs.submit(user_id, work)
+    return jsonify(_job_to_dict(job, created)), 202
+
+@favorites_bp.route('/sync/<job_id>', methods=['GET'])
+@jwt_required()
+def get_sync_job(job_id):
+    """Progress of a sync job (teams done, fixtures added, errors)"""
+    user_id = int(get_jwt_identity())
+    job = sync_jobs.get(job_id)
+    if not job or job['user_id'] != user_id:
+        return jsonify({'error': 'Sync job not found'}), 404
+    return jsonify(_job_to_dict(job)), 200
 
+def _job_to_dict(job, created=None):
+    data = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'teams_total': job['teams_total'],
+        'teams_done': job['teams_done'],
+        'fixtures_added': job['fixtures_added'],
+        'total_added': job['fixtures_added'],  # Same name as the old synchronous response
+        'errors': job['errors'],
+        'status_url': f"/api/favorites/sync/{job['id']}"
+    }
+    if created is not None:
+        data['created'] = created
+    return data
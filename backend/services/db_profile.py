@@ -0,0 +1,192 @@
+"""
+Database Profile
+Engine settings applied by create_app: pool sizing, pre-ping, statement
+timeouts, the SQLite performance profile and the read/write split.
+
+Writes (sync, auth, migrations) use the primary engine behind db.session.
+Read-only request paths (ICS feed generation, /calendar/events) use
+read_session(), bound to the 'read' bind: DATABASE_READ_URL (a replica)
+when set, otherwise a separate read-only pool on the primary database.
+
+SQLite profile: every pooled connection gets WAL journaling (readers never
+block the writer), synchronous=NORMAL (durable at checkpoints, no fsync per
+commit), a busy timeout (writers queue instead of failing with "database is
+locked"), a memory-mapped read path and a larger page cache.
+SQLITE_PROFILE=False falls back to SQLAlchemy's stock SQLite settings.
+"""
+import time
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from extensions import db
+
+READ_BIND = 'read'
+
+
+def _is_file_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def read_url(app):
+    """URL of the read bind: the replica if configured, else a read-only view of the primary"""
+    if app.config['DATABASE_READ_URL']:
+        return app.config['DATABASE_READ_URL']
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if _is_file_sqlite(url):
+        database = url.database if url.database.startswith('file:') else f"file:{url.database}"
+        return url.set(database=database, query=dict(url.query, mode='ro', uri='true')) \
+            .render_as_string(hide_password=False)
+    return app.config['SQLALCHEMY_DATABASE_URI']
+
+
+def engine_options(app, uri, read_only=False):
+    """create_engine() options for one bind"""
+    config = app.config
+    url = make_url(uri)
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    pool = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_POOL_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+
+    if url.get_backend_name() == 'sqlite':
+        if not _is_file_sqlite(url) or not config['SQLITE_PROFILE']:
+            return {}  # Flask-SQLAlchemy's defaults (StaticPool for :memory:)
+        options.update(pool, poolclass=QueuePool, connect_args={
+            'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+            'check_same_thread': False  # pooled connections move between threads
+        })
+        return options
+
+    options.update(pool, pool_recycle=config['DB_POOL_RECYCLE'])
+    if url.get_backend_name() == 'postgresql':
+        timeout = config['DB_READ_STATEMENT_TIMEOUT_MS' if read_only else 'DB_STATEMENT_TIMEOUT_MS']
+        settings = []
+        if timeout:
+            settings.append(f"-c statement_timeout={timeout}")
+        if read_only:
+            settings.append("-c default_transaction_read_only=on")
+        if settings:
+            options['connect_args'] = {'options': ' '.join(settings)}
+    return options
+
+
+def configure_engines(app):
+    """Set engine options and the read bind (call before db.init_app)"""
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.update(engine_options(app, uri))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    if app.config['DATABASE_READ_URL'] or app.config['DB_READ_POOL']:
+        url = make_url(uri)
+        if url.get_backend_name() == 'sqlite' and not _is_file_sqlite(url):
+            return  # an in-memory database can't be opened twice
+        read = read_url(app)
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds[READ_BIND] = dict(engine_options(app, read, read_only=True), url=read)
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def install_engine_events(app):
+    """Per-connection PRAGMAs and SQLite statement timeouts (call in an app context after init_app)"""
+    config = app.config
+    for bind, engine in db.engines.items():
+        if not _is_file_sqlite(engine.url):
+            continue
+        read_only = bind == READ_BIND
+        if config['SQLITE_PROFILE']:
+            install_pragmas(engine, config, read_only=read_only)
+        timeout = config['DB_READ_STATEMENT_TIMEOUT_MS' if read_only else 'DB_STATEMENT_TIMEOUT_MS']
+        if timeout:
+            install_statement_timeout(engine, timeout)
+
+    @app.teardown_appcontext
+    def close_read_session(exc):
+        session = g.pop('db_read_session', None)
+        if session is not None:
+            session.close()
+
+
+def install_pragmas(engine, config, read_only=False):
+    """Apply the profile's PRAGMAs to every new connection of engine"""
+    pragmas = [
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('cache_size', -config['SQLITE_CACHE_SIZE_KB']),  # negative = KiB, not pages
+    ]
+    if not read_only:  # a read-only connection can't change the journal
+        pragmas = [('journal_mode', 'WAL'), ('synchronous', config['SQLITE_SYNCHRONOUS'])] + pragmas
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def install_statement_timeout(engine, timeout_ms):
+    """
+    SQLite has no statement_timeout: interrupt a statement from the progress
+    handler once it has run for timeout_ms (raises OperationalError 'interrupted').
+    """
+    limit = timeout_ms / 1000
+
+    @event.listens_for(engine, 'connect')
+    def add_progress_handler(dbapi_connection, connection_record):
+        info = connection_record.info
+        dbapi_connection.set_progress_handler(
+            lambda: 1 if info.get('deadline') and time.monotonic() > info['deadline'] else 0, 10000
+        )
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_clock(conn, cursor, statement, parameters, context, executemany):
+        conn.info['deadline'] = time.monotonic() + limit
+        conn.info['statement_timeout'] = limit
+
+    def stop_clock(conn):
+        conn.info.pop('deadline', None)
+
+    # Results are stepped lazily, so the clock runs until the transaction ends
+    event.listen(engine, 'commit', stop_clock)
+    event.listen(engine, 'rollback', stop_clock)
+    event.listen(engine.pool, 'checkin', lambda dbapi_connection, record: record.info.pop('deadline', None))
+
+
+def renew_statement_deadline(session):
+    """
+    Give session's running statement a fresh timeout. For cursors read in
+    batches (feed builds): the limit then bounds each batch, not the whole read.
+    """
+    info = session.connection().info
+    if info.get('deadline'):
+        info['deadline'] = time.monotonic() + info['statement_timeout']
+
+
+def read_session():
+    """
+    Request-scoped session on the read bind (falls back to db.session).
+    Objects loaded here are read-only; write changes through db.session.
+    """
+    engine = db.engines.get(READ_BIND)
+    if engine is None:
+        return db.session
+    if 'db_read_session' not in g:
+        g.db_read_session = Session(bind=engine, autoflush=False)
+    return g.db_read_session
+
+
+def pragma_report(engine):
+    """Effective settings on one pooled connection (for health checks)"""
+    report = {'pool': engine.pool.status()}
+    if engine.url.get_backend_name() == 'sqlite':
+        names = ['journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size']
+        with engine.connect() as conn:
+            report.update({name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names})
+    return report
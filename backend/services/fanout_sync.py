@@ -0,0 +1,158 @@
+"""
+Fan-out Sync
+Scheduled favorites sync driven by teams rather than users.
+
+FavoriteTeam rows are grouped by team_id and every distinct team is fetched
+once, however many users follow it. Each follower's filters are applied to
+that shared result, new SavedFixture rows for all followers go in as one
+bulk insert, and only the feeds of users who gained fixtures (or whose saved
+fixtures changed) are invalidated. Upstream calls scale with distinct teams.
+
+Runs inside `python app.py`, or as its own process (python -m
+services.fanout_sync --loop, the sport-fanout service in production:
+gunicorn workers don't start it). A worker lock keeps it to one runner.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from extensions import db
+from models import FavoriteTeam
+from services.filters import compile_filters
+from services.fixture_store import upsert_fixtures, save_for_users, subscriber_usernames
+from services import feed_cache
+
+
+class FanoutSync:
+    def __init__(self, app, api, interval=3600, team_batch=50, next_n=10):
+        self.app = app
+        self.api = api
+        self.interval = interval
+        self.team_batch = team_batch  # distinct teams fetched (and committed) per round
+        self.next_n = next_n
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'runs': 0, 'teams_fetched': 0, 'fixtures_added': 0,
+                      'users_invalidated': 0, 'errors': 0, 'last_run': None}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='fanout-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Fan-out sync error: {e}")
+            self._stop.wait(self.interval)
+
+    def followers_by_team(self):
+        """{team_id: [(user_id, FilterPredicate), ...]} for every followed team"""
+        followers = defaultdict(list)
+        rows = db.session.query(FavoriteTeam.team_id, FavoriteTeam.user_id, FavoriteTeam.filters).all()
+        for team_id, user_id, filters in rows:
+            # Identical filter strings share one compiled predicate
+            followers[team_id].append((user_id, compile_filters(filters)))
+        return followers
+
+    def run_once(self):
+        """
+        Sync every followed team once.
+
+        Returns:
+            dict: {'teams', 'fetched', 'fixtures_added', 'users_invalidated', 'failed'}
+        """
+        with self.app.app_context():
+            self.stats['runs'] += 1
+            self.stats['last_run'] = datetime.utcnow().isoformat()
+            followers = self.followers_by_team()
+            team_ids = sorted(followers)
+            result = {'teams': len(team_ids), 'fetched': 0, 'fixtures_added': 0,
+                      'users_invalidated': 0, 'failed': []}
+
+            for i in range(0, len(team_ids), self.team_batch):
+                chunk = team_ids[i:i + self.team_batch]
+                try:
+                    self._sync_teams(chunk, followers, result)
+                except Exception as e:
+                    db.session.rollback()
+                    self.stats['errors'] += 1
+                    result['failed'].extend(chunk)
+                    print(f"Fan-out sync failed for teams {chunk}: {e}")
+
+            self.stats['teams_fetched'] += result['fetched']
+            self.stats['fixtures_added'] += result['fixtures_added']
+            self.stats['users_invalidated'] += result['users_invalidated']
+            return result
+
+    def _sync_teams(self, team_ids, followers, result):
+        batch = self.api.fetch_fixtures_for_teams(team_ids, next_n=self.next_n)
+        result['failed'].extend(batch['timed_out'] + batch['failed'])
+
+        wanted = {}
+        pairs = []
+        for team_id, fixtures in batch['fixtures'].items():
+            result['fetched'] += 1
+            fixtures = [(int(f['fixture']['id']), f) for f in fixtures]
+            for user_id, include in followers[team_id]:
+                for fid, f in fixtures:
+                    if include(f):
+                        wanted[fid] = f
+                        pairs.append((user_id, fid))
+        if not pairs:
+            return
+
+        _, changed = upsert_fixtures(list(wanted.values()))
+        added = save_for_users(pairs)
+        # Subscribers of changed fixtures, plus everyone who gained a fixture
+        affected = set(subscriber_usernames(fixture_ids=changed)) if changed else set()
+        if added:
+            affected.update(subscriber_usernames(user_ids={user_id for user_id, _ in added}))
+        db.session.commit()
+
+        feed_cache.invalidate_many(affected)
+        result['fixtures_added'] += len(added)
+        result['users_invalidated'] += len(affected)
+
+
+def main():
+    """
+    Run one fan-out pass (e.g. from cron), or with --loop one every
+    FANOUT_SYNC_INTERVAL seconds (the production service)
+    """
+    import argparse
+    from app import create_app
+    from services import worker_lock
+    from services.football_service import football_api
+    parser = argparse.ArgumentParser(prog='python -m services.fanout_sync')
+    parser.add_argument('--loop', action='store_true', help='keep running, one pass per interval')
+    args = parser.parse_args()
+
+    if not worker_lock.acquire('fanout_sync'):
+        raise SystemExit('Fan-out sync already runs in another process')
+    app = create_app()
+    fanout = FanoutSync(app, football_api, interval=app.config['FANOUT_SYNC_INTERVAL'])
+    while True:
+        try:
+            result = fanout.run_once()
+            print(f"Synced {result['teams']} teams: {result['fixtures_added']} fixtures added, "
+                  f"{result['users_invalidated']} feeds invalidated, {len(result['failed'])} teams failed")
+        except Exception as e:
+            if not args.loop:
+                raise
+            print(f"Fan-out sync error: {e}")
+        if not args.loop:
+            break
+        time.sleep(fanout.interval)
+
+
+if __name__ == '__main__':
+    main()
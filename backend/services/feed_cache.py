@@ -0,0 +1,683 @@
+"""
+Feed Cache
+Cached ICS feeds in instance/cache, each with a sidecar holding the
+strong ETag (SHA-256 of the body) and file sizes, so conditional polls can
+be answered from a stat and a header compare without reading the feed.
+
+Files live in 256 hashed shard directories (instance/cache/<2 hex>/), each
+with a small manifest.json of its feeds' sizes and store times; usage(),
+evict() and clear() work from the manifests, not per-file syscalls. Manifest
+updates are serialised across processes by an flock on the shard's
+manifest.lock. Every
+file is written to a temp file and renamed into place, so readers see the
+old or the new copy, never a partial one. A body whose size doesn't match
+its sidecar (e.g. after a crash) is treated as missing and rebuilt.
+
+Feeds are keyed by username, or 'teams/<team_id>/<filters>' for shared
+team feeds. Usernames are percent-encoded into their file name (see
+cache_path), and registration rejects '/', so a user key can't reach a team
+feed or a path outside the cache directory.
+A feed can be stored with a tag (e.g. the version of the data it was built
+from), returned by lookup() for the caller to compare.
+
+The hottest feeds are also kept in memory as encoded bytes (byte-bounded
+LRU). A memory entry is only served while the file on disk still has the
+same mtime/size, so invalidation by any process evicts it everywhere.
+Lookup order: memory -> disk -> regenerate.
+
+Compressed variants (gzip, plus brotli/zstd when those packages are
+installed) are produced once at store time and kept next to the plain
+feed, so serving a poll never compresses on the request path.
+
+Invalidation keeps the previous feed and only marks it stale (its mtime is
+back-dated past CACHE_DURATION). rebuild() regenerates a feed once per user
+at a time; while that runs, other polls are served the stale copy
+(stale-while-revalidate) and only a user with no feed at all waits for it.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from urllib.parse import quote
+from config import FEED_CACHE_MEMORY_BYTES, FEED_REBUILD_WORKERS
+from services.single_flight import SingleFlight
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifests are only locked within the process
+    fcntl = None
+
+class _BrotliStream:
+    """brotli.Compressor with the zlib-style compress()/flush() interface"""
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=9)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+# Content-Encoding -> (file suffix, incremental compressor factory), in server preference order
+ENCODINGS = OrderedDict()
+if brotli:
+    ENCODINGS['br'] = ('.br', _BrotliStream)
+if zstandard:
+    ENCODINGS['zstd'] = ('.zst', lambda: zstandard.ZstdCompressor(level=12).compressobj())
+ENCODINGS['gzip'] = ('.gz', lambda: zlib.compressobj(9, zlib.DEFLATED, 31))  # wbits 31 = gzip container
+
+CACHE_DIR = os.path.join(os.getcwd(), 'instance', 'cache')
+os.makedirs(CACHE_DIR, exist_ok=True)
+SHARD_CHARS = 2  # hex digits of sha1(username): 256 shard directories
+MANIFEST = 'manifest.json'
+MANIFEST_LOCK = 'manifest.lock'
+TEAM_KEY = re.compile(r'teams/\d+/(all|[0-9a-f]{12})\Z')  # Keys built by routes.calendar._team_feed_key
+MAX_NAME_CHARS = 200  # Longer encoded usernames are hashed to stay under NAME_MAX with suffixes
+CACHE_DURATION = 6 * 3600  # 6 Hours in seconds
+FEED_MAX_AGE = 15 * 60  # Cache-Control max-age sent to calendar clients
+
+
+class _MemoryTier:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # username -> entry (with 'body')
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key, st):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['mtime_ns'] != st.st_mtime_ns or entry['size'] != st.st_size:
+                self._drop(key)  # File was rewritten or replaced elsewhere
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if entry['bytes'] > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry['bytes']
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['bytes']
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def usage(self):
+        with self._lock:
+            return len(self._entries), self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry['bytes']
+
+
+_memory = _MemoryTier(FEED_CACHE_MEMORY_BYTES)
+_rebuilds = SingleFlight()
+_background = ThreadPoolExecutor(max_workers=FEED_REBUILD_WORKERS, thread_name_prefix='feed-rebuild')
+_pending_lock = threading.Lock()
+_manifest_lock = threading.Lock()
+_pending = {}  # username -> Future of a queued background rebuild
+_stats_lock = threading.Lock()
+_stats = {'memory_hits': 0, 'disk_hits': 0, 'stale_hits': 0, 'misses': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """Hit counters and ratios per tier, plus memory usage"""
+    with _stats_lock:
+        counts = dict(_stats)
+    lookups = sum(counts.values())
+    entries, used = _memory.usage()
+    counts.update({
+        'memory_hit_ratio': round(counts['memory_hits'] / lookups, 3) if lookups else 0.0,
+        'disk_hit_ratio': round(counts['disk_hits'] / lookups, 3) if lookups else 0.0,
+        'memory_entries': entries,
+        'memory_bytes': used,
+        'memory_max_bytes': _memory.max_bytes,
+        'memory_evictions': _memory.evictions,
+        'rebuilds': _rebuilds.stats()
+    })
+    return counts
+
+
+def _shard(username):
+    return hashlib.sha1(username.encode('utf-8')).hexdigest()[:SHARD_CHARS]
+
+
+def cache_path(username):
+    """
+    Feed file of a key. Team keys keep their layout (<shard>/teams/<id>/...);
+    a username is percent-encoded into one file name, so it can't leave its
+    shard or land on a team feed whatever characters it holds.
+    """
+    if TEAM_KEY.match(username):
+        name = username
+    else:
+        name = quote(username, safe='')
+        if name.startswith('.'):
+            name = '%2E' + name[1:]  # Keep user feeds off dotfiles (.tmp-*)
+        if len(name) > MAX_NAME_CHARS:
+            name = hashlib.sha1(username.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, _shard(username), f"{name}.ics")
+
+
+def _meta_path(path):
+    return f"{path}.meta"
+
+
+def _atomic_write(path, data):
+    """Write data to a temp file in the same directory and rename it over path"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _variant_paths(path):
+    return [f"{path}{suffix}" for suffix, _ in ENCODINGS.values()]
+
+
+def _probe(username):
+    """(entry, fresh) for the feed on disk, or (None, False) if there is none"""
+    path = cache_path(username)
+    try:
+        st = os.stat(path)
+    except OSError:
+        _memory.discard(username)
+        return None, False
+    if time.time() - st.st_mtime < CACHE_DURATION:
+        entry = _memory.get(username, st)
+        if entry:
+            return entry, True
+
+    try:
+        with open(_meta_path(path), 'rb') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None, False
+    if meta.get('size') != st.st_size:
+        return None, False  # Body and sidecar are from different writes
+    entry = {'key': username, 'path': path, 'etag': meta['etag'], 'last_modified': st.st_mtime,
+             'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'variant_sizes': meta.get('variants', {}),
+             'tag': meta.get('tag')}
+    return entry, time.time() - st.st_mtime < CACHE_DURATION
+
+
+def lookup(username, allow_stale=False):
+    """
+    Metadata of a fresh cached feed, or None if missing/expired.
+
+    Args:
+        allow_stale: also return an expired or invalidated feed, marked
+            with entry['stale'] = True, instead of None
+
+    Returns:
+        dict: {'path', 'etag', 'last_modified' (epoch seconds), 'size', 'mtime_ns'}
+        plus 'body' and 'variants' ({encoding: bytes}) once loaded (see load).
+    """
+    entry, fresh = _probe(username)
+    if entry is None or not (fresh or allow_stale):
+        _count('misses')
+        return None
+    if fresh:
+        _count('memory_hits' if entry.get('body') is not None else 'disk_hits')
+        return entry
+    _count('stale_hits')
+    return dict(entry, stale=True)
+
+
+def load(entry):
+    """
+    Entry with body and compressed variants loaded; disk entries are
+    promoted into the memory tier.
+    """
+    if entry.get('body') is not None:
+        return entry
+    with open(entry['path'], 'rb') as f:
+        body = f.read()
+    variants = {}
+    for encoding, (suffix, _) in ENCODINGS.items():
+        try:
+            with open(f"{entry['path']}{suffix}", 'rb') as f:
+                variant = f.read()
+        except OSError:
+            continue  # Serve identity for this encoding
+        if len(variant) == entry['variant_sizes'].get(encoding):
+            variants[encoding] = variant
+    entry = dict(entry, body=body, variants=variants,
+                 bytes=len(body) + sum(len(v) for v in variants.values()))
+    if len(body) == entry['size']:
+        _memory.put(entry['key'], entry)
+    return entry
+
+
+def read(entry, encoding=None):
+    """Body bytes of a cached feed, in the given Content-Encoding if a variant exists"""
+    entry = load(entry)
+    if encoding:
+        return entry['variants'].get(encoding)
+    return entry['body']
+
+
+class _Output:
+    """One temp file of a _FeedWriter: the body (encoding None) or a compressed variant"""
+    def __init__(self, encoding, tmp, file, compressor):
+        self.encoding = encoding
+        self.tmp = tmp
+        self.file = file
+        self.compressor = compressor
+        self.size = 0
+        self.chunks = []
+
+
+class _FeedWriter:
+    """
+    Tees a feed's bytes into temp files next to its cache path (the body and
+    one per compressed variant) while hashing it; commit() renames them into
+    place. A disk error stops the caching, never the caller's stream.
+    """
+    def __init__(self, username, keep=False):
+        self.username = username
+        self.path = cache_path(username)
+        self._hash = hashlib.sha256()
+        self._keep = keep
+        self._outputs = []
+        self.failed = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            for encoding, (suffix, factory) in [(None, ('', None))] + list(ENCODINGS.items()):
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix='.tmp-')
+                self._outputs.append(_Output(encoding, tmp, os.fdopen(fd, 'wb'), factory() if factory else None))
+        except OSError as e:
+            self._fail(e)
+
+    def write(self, data):
+        self._hash.update(data)
+        if self.failed:
+            return
+        try:
+            for output in self._outputs:
+                self._emit(output, output.compressor.compress(data) if output.compressor else data)
+        except OSError as e:
+            self._fail(e)
+
+    def _emit(self, output, data):
+        if data:
+            output.file.write(data)
+            output.size += len(data)
+            if self._keep:
+                output.chunks.append(data)
+
+    def _fail(self, error):
+        print(f"Cache write error: {error}")
+        self.failed = True
+        self.abort()
+
+    def abort(self):
+        """Drop the temp files"""
+        for output in self._outputs:
+            output.file.close()
+            try:
+                os.remove(output.tmp)
+            except OSError:
+                pass
+        self._outputs = []
+
+    def commit(self, started_at=None, tag=None):
+        """
+        Move the feed into place. Returns the stored entry ('body' and
+        'variants' included if keep), or None if it couldn't be cached.
+
+        started_at: when generation began. If the feed was invalidated since
+        then, the new copy is stored already stale so the next poll rebuilds it.
+        tag: optional string kept in the sidecar and returned by lookup()
+        """
+        if self.failed:
+            return None
+        try:
+            for output in self._outputs:
+                if output.compressor:
+                    self._emit(output, output.compressor.flush())
+                output.file.close()
+        except OSError as e:
+            self._fail(e)
+            return None
+
+        path = self.path
+        body, variants = self._outputs[0], self._outputs[1:]
+        meta = {'etag': self._hash.hexdigest(), 'size': body.size,
+                'variants': {output.encoding: output.size for output in variants}, 'tag': tag}
+        invalidated = started_at is not None and _invalidated_since(path, started_at)
+        try:
+            # Drop the old sidecar first so a concurrent reader never pairs it
+            # with the new body; the sidecar is written last.
+            try:
+                os.remove(_meta_path(path))
+            except FileNotFoundError:
+                pass
+            for output in variants:
+                os.replace(output.tmp, f"{path}{ENCODINGS[output.encoding][0]}")
+            os.replace(body.tmp, path)
+            if invalidated:
+                _mark_stale(path)
+            _atomic_write(_meta_path(path), json.dumps(meta).encode('ascii'))
+            st = os.stat(path)
+        except OSError as e:
+            self._fail(e)
+            _memory.discard(self.username)
+            return None
+        self._outputs = []
+
+        entry = {'key': self.username, 'path': path, 'etag': meta['etag'], 'last_modified': st.st_mtime,
+                 'size': meta['size'], 'mtime_ns': st.st_mtime_ns, 'variant_sizes': meta['variants'],
+                 'bytes': meta['size'] + sum(meta['variants'].values()), 'tag': tag}
+        if self._keep:
+            entry['body'] = b''.join(body.chunks)
+            entry['variants'] = {output.encoding: b''.join(output.chunks) for output in variants}
+            if not invalidated:
+                _memory.put(self.username, entry)
+        else:
+            _memory.discard(self.username)
+        try:
+            _update_manifest(_shard(self.username), {self.username: {'bytes': entry['bytes'],
+                                                                     'stored_at': int(time.time())}})
+        except OSError as e:
+            print(f"Cache manifest error: {e}")
+        return entry
+
+
+def store(username, content, started_at=None, tag=None):
+    """
+    Write a freshly generated feed and its compressed variants.
+
+    Args:
+        content: the ICS text, or an iterable of text chunks (written as
+            they arrive; the entry is then returned without its body)
+        started_at, tag: see _FeedWriter.commit
+
+    Returns:
+        dict: the stored entry. A feed given as text is returned (and
+        served) even if it couldn't be cached; for chunks that yields None.
+    """
+    if isinstance(content, str):
+        body = content.encode('utf-8')
+        writer = _FeedWriter(username, keep=True)
+        writer.write(body)
+        entry = writer.commit(started_at, tag)
+        if entry is None:
+            variants = {}
+            for encoding, (_, factory) in ENCODINGS.items():
+                compressor = factory()
+                variants[encoding] = compressor.compress(body) + compressor.flush()
+            entry = {'key': username, 'path': writer.path, 'etag': hashlib.sha256(body).hexdigest(),
+                     'last_modified': time.time(), 'size': len(body), 'mtime_ns': None, 'body': body,
+                     'variants': variants, 'bytes': len(body) + sum(len(v) for v in variants.values()),
+                     'tag': tag}
+        return entry
+
+    writer = _FeedWriter(username)
+    try:
+        for chunk in content:
+            writer.write(chunk.encode('utf-8'))
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit(started_at, tag)
+
+
+def _mark_stale(path):
+    """Back-date a feed past CACHE_DURATION (cross-process: memory tiers see the new mtime)"""
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, min(st.st_mtime, time.time() - CACHE_DURATION - 1)))
+
+
+def _invalidated_since(path, started_at):
+    """True if the feed on disk was marked stale after started_at (utime bumps ctime)"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_ctime >= started_at and time.time() - st.st_mtime >= CACHE_DURATION
+
+
+def invalidate(username):
+    """
+    Mark a user's cached feed stale (both tiers) so the next poll rebuilds
+    it. The previous copy is kept to be served while the rebuild runs.
+    """
+    _memory.discard(username)
+    try:
+        _mark_stale(cache_path(username))
+    except OSError:
+        pass  # No feed cached
+
+
+def invalidate_many(usernames):
+    for username in usernames:
+        invalidate(username)
+
+
+def _read_manifest(shard):
+    try:
+        with open(os.path.join(CACHE_DIR, shard, MANIFEST), 'rb') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+@contextmanager
+def _shard_lock(shard):
+    """Exclusive flock on a shard's lock file, across processes (gunicorn workers)"""
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.join(CACHE_DIR, shard)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, MANIFEST_LOCK), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)  # Released when the file is closed
+        yield
+
+
+def _update_manifest(shard, records):
+    """Apply {username: record or None (drop)} to a shard's manifest"""
+    with _manifest_lock, _shard_lock(shard):
+        manifest = _read_manifest(shard)
+        for username, record in records.items():
+            if record is None:
+                manifest.pop(username, None)
+            else:
+                manifest[username] = record
+        _atomic_write(os.path.join(CACHE_DIR, shard, MANIFEST),
+                      json.dumps(manifest, separators=(',', ':')).encode('utf-8'))
+
+
+def _shards():
+    try:
+        return [name for name in os.listdir(CACHE_DIR) if len(name) == SHARD_CHARS]
+    except OSError:
+        return []
+
+
+def usage():
+    """Feed count and bytes on disk, summed from the shard manifests"""
+    feeds = total = 0
+    shards = _shards()
+    for shard in shards:
+        manifest = _read_manifest(shard)
+        feeds += len(manifest)
+        total += sum(record['bytes'] for record in manifest.values())
+    return {'shards': len(shards), 'feeds': feeds, 'bytes': total}
+
+
+def _delete_files(username):
+    _memory.discard(username)
+    path = cache_path(username)
+    for p in [path, _meta_path(path)] + _variant_paths(path):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+
+def remove(username):
+    """Delete a user's cached feed and its manifest record"""
+    _delete_files(username)
+    if username in _read_manifest(_shard(username)):
+        _update_manifest(_shard(username), {username: None})
+
+
+def evict(max_age):
+    """
+    Delete feeds not rebuilt for max_age seconds (users who stopped polling).
+    Candidates come from the manifests. Returns the number of feeds removed.
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    for shard in _shards():
+        expired = [username for username, record in _read_manifest(shard).items()
+                   if record['stored_at'] < cutoff]
+        for username in expired:
+            _delete_files(username)
+        if expired:
+            _update_manifest(shard, dict.fromkeys(expired))
+            removed += len(expired)
+    return removed
+
+
+def clear():
+    """
+    Drop every cached feed: the cache directory is swapped for an empty one
+    at once and the old tree is deleted on a background thread.
+    """
+    trash = f"{CACHE_DIR}.trash-{uuid.uuid4().hex[:8]}"
+    # Every shard's flock, so no other process is midway through a manifest update
+    with _manifest_lock, ExitStack() as locks:
+        for shard in sorted(_shards()):
+            locks.enter_context(_shard_lock(shard))
+        try:
+            os.replace(CACHE_DIR, trash)
+        except FileNotFoundError:
+            trash = None
+        os.makedirs(CACHE_DIR, exist_ok=True)
+    _memory.clear()
+    if trash:
+        threading.Thread(target=shutil.rmtree, args=(trash,), kwargs={'ignore_errors': True}).start()
+
+
+def rebuild(username, render, tag=None):
+    """
+    Regenerate a user's feed, once per user at a time: concurrent callers
+    wait for and share the running rebuild's entry.
+
+    Args:
+        render: callable returning the ICS text (or an iterable of text
+            chunks), or None if there is no feed to serve (nothing is stored then)
+        tag: stored with the feed (see store)
+
+    Returns:
+        dict: loaded entry, or None if render() returned None
+    """
+    def run():
+        entry, fresh = _probe(username)
+        if fresh:
+            return entry  # Stored by a rebuild that finished just before this one
+        started_at = time.time()
+        content = render()
+        if content is None:
+            return None
+        entry = store(username, content, started_at=started_at, tag=tag)
+        if entry is None:
+            # Streamed chunks couldn't be cached: render once more to serve from memory
+            content = render()
+            entry = store(username, ''.join(content), started_at=started_at, tag=tag) if content is not None else None
+        return entry
+
+    return _rebuilds.do(username, run)
+
+
+def open_file(entry, encoding=None):
+    """
+    Open a cached feed (or one of its compressed variants) for serving in
+    blocks. Returns None if the file is missing or doesn't match the sidecar.
+    """
+    path = entry['path']
+    size = entry['size']
+    if encoding:
+        path = f"{path}{ENCODINGS[encoding][0]}"
+        size = entry['variant_sizes'].get(encoding)
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    if os.fstat(f.fileno()).st_size != size:
+        f.close()
+        return None
+    return f
+
+
+def rebuild_in_background(username, render, tag=None):
+    """
+    Queue rebuild(username, render, tag) on the worker pool, or return the
+    rebuild already queued for the user. Returns its Future (result: entry).
+    """
+    with _pending_lock:
+        future = _pending.get(username)
+        if future is None:
+            future = _pending[username] = _background.submit(rebuild, username, render, tag)
+            future.add_done_callback(lambda f: _finish_background(username, f))
+        return future
+
+
+def _finish_background(username, future):
+    with _pending_lock:
+        if _pending.get(username) is future:
+            del _pending[username]
+    if future.exception():
+        print(f"Error rebuilding feed for {username}: {future.exception()}")
@@ -0,0 +1,78 @@
+"""
+Subscription Filters
+Decides which fixtures a FavoriteTeam subscription puts on the calendar.
+
+A filters list is compiled once into a FilterPredicate: the league types it
+allows plus one combined regex over its league-name keywords. Compiled
+predicates are cached by the stored JSON string, so the many followers who
+share the same filters share one predicate.
+"""
+import json
+import re
+from functools import lru_cache
+
+TYPE_FILTERS = ('League', 'Cup')
+
+
+class FilterPredicate:
+    """Compiled filters: call with an API fixture object, or use matches()"""
+
+    def __init__(self, filters):
+        filters = [f for f in (filters or []) if isinstance(f, str)]
+        self.include_all = not filters or 'All' in filters
+        self.types = frozenset(f for f in filters if f in TYPE_FILTERS)
+        self.keywords = tuple(sorted({f for f in filters if f not in TYPE_FILTERS and f != 'All'}))
+        self._keywords = re.compile('|'.join(map(re.escape, self.keywords))).search if self.keywords else None
+
+    def matches(self, league_type, league_name):
+        if self.include_all or league_type in self.types:
+            return True
+        # Specific league name matches (e.g. "Champions League")
+        return bool(self._keywords and league_name and self._keywords(league_name))
+
+    def __call__(self, fixture):
+        if self.include_all:
+            return True
+        league = fixture['league']
+        return self.matches(league.get('type'), league.get('name'))
+
+
+@lru_cache(maxsize=1024)
+def _compile_json(raw):
+    try:
+        filters = json.loads(raw) if raw else None
+    except ValueError:
+        filters = None
+    return FilterPredicate(filters)
+
+
+@lru_cache(maxsize=1024)
+def _compile_tuple(filters):
+    return FilterPredicate(filters)
+
+
+def compile_filters(filters):
+    """
+    Cached predicate for a filters value.
+
+    Args:
+        filters: JSON string as stored in FavoriteTeam.filters, or a list of
+            filter strings like ['League', 'Cup', 'Champions League'], or None
+    """
+    if filters is None or isinstance(filters, str):
+        return _compile_json(filters)
+    return _compile_tuple(tuple(filters))
+
+
+def should_include_fixture(fixture, filters):
+    """
+    Determine if a fixture should be included based on user's filter preferences.
+
+    Args:
+        fixture: API fixture object with 'league' containing 'type' and 'name'
+        filters: List of filter strings like ['League', 'Cup', 'Champions League'] or None
+
+    Returns:
+        bool: True if fixture should be included
+    """
+    return compile_filters(filters)(fixture)
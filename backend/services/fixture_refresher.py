@@ -0,0 +1,165 @@
+"""
+Fixture Refresher
+Background worker that keeps the shared fixture store fresh so the ICS
+feed never has to call the upstream API inside a request.
+
+Runs inside `python app.py`, or as its own process (python -m
+services.fixture_refresher, the sport-refresher service in production:
+gunicorn workers don't start it). A worker lock keeps it to one runner.
+
+Every fixture referenced by a SavedFixture or listed in shared team feeds
+(verified) is re-fetched on a schedule
+driven by kickoff proximity and status: every minute while live, every
+few minutes close to kickoff, rarely for fixtures weeks away, and never
+again once a finished match has settled.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from extensions import db
+from models import Fixture, SavedFixture
+from services.fixture_store import upsert_fixtures, subscriber_usernames
+from services import feed_cache
+
+LIVE_STATUSES = {'1H', 'HT', '2H', 'ET', 'BT', 'P', 'SUSP', 'INT', 'LIVE'}
+FINISHED_STATUSES = {'FT', 'AET', 'PEN', 'CANC', 'ABD', 'AWD', 'WO'}
+POSTPONED_STATUSES = {'PST', 'TBD'}
+
+# Finished matches are re-checked for this long (late score corrections), then dropped
+SETTLE_WINDOW = timedelta(hours=24)
+
+# Ids upstream answers for without returning (e.g. bogus ids) are pushed back this
+# far, so they can't fill every batch ahead of real fixtures
+UNKNOWN_BACKOFF = timedelta(hours=6)
+
+
+def refresh_interval(status, kickoff_at, now):
+    """How stale a fixture may get before it is re-fetched (None = never again)"""
+    if status in LIVE_STATUSES:
+        return timedelta(minutes=1)
+    if status in FINISHED_STATUSES:
+        if kickoff_at and now - kickoff_at < SETTLE_WINDOW:
+            return timedelta(hours=1)
+        return None
+    if status in POSTPONED_STATUSES or kickoff_at is None:
+        return timedelta(hours=12)
+
+    until_kickoff = kickoff_at - now
+    if until_kickoff < timedelta(hours=3):  # includes "should have started" NS
+        return timedelta(minutes=5) if until_kickoff > timedelta(0) else timedelta(minutes=1)
+    if until_kickoff < timedelta(days=1):
+        return timedelta(minutes=30)
+    if until_kickoff < timedelta(days=7):
+        return timedelta(hours=6)
+    return timedelta(hours=24)
+
+
+class FixtureRefresher:
+    def __init__(self, app, api, tick=30, batch_size=200):
+        self.app = app
+        self.api = api
+        self.tick = tick
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'runs': 0, 'fetched': 0, 'changed': 0, 'errors': 0, 'last_run': None}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='fixture-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Fixture refresher error: {e}")
+            self._stop.wait(self.tick)
+
+    def due_fixture_ids(self, now=None):
+        """Ids of tracked fixtures whose refresh interval has elapsed, most urgent first"""
+        now = now or datetime.utcnow()
+        saved = db.session.query(SavedFixture.fixture_id).distinct()
+        rows = db.session.query(
+            Fixture.fixture_id, Fixture.status, Fixture.kickoff_at, Fixture.refreshed_at
+        ).filter(
+            # Team feeds serve verified rows whether or not anyone saved them
+            db.or_(Fixture.verified.is_(True), Fixture.fixture_id.in_(saved)),
+            # Settled results never come due again - skip them in SQL
+            db.or_(Fixture.status.notin_(FINISHED_STATUSES),
+                   Fixture.status.is_(None),
+                   Fixture.kickoff_at > now - SETTLE_WINDOW)
+        ).all()
+
+        due = []
+        for fixture_id, status, kickoff_at, refreshed_at in rows:
+            interval = refresh_interval(status, kickoff_at, now)
+            if interval is None:
+                continue
+            overdue = now - (refreshed_at or datetime.min)
+            if overdue >= interval:
+                due.append((interval, -overdue.total_seconds(), fixture_id))
+        due.sort()
+        return [fixture_id for _, _, fixture_id in due[:self.batch_size]]
+
+    def run_once(self):
+        """Refresh one batch of due fixtures. Returns the ids whose payload changed."""
+        with self.app.app_context():
+            now = datetime.utcnow()
+            due = self.due_fixture_ids(now)
+            self.stats['runs'] += 1
+            self.stats['last_run'] = now.isoformat()
+            if not due:
+                return []
+
+            batch = self.api.fetch_fixtures_by_ids(due)
+            _, changed = upsert_fixtures(batch['response'])
+            unknown = set(batch.get('unknown', []))
+            # Timed-out/failed ids wait one interval like fetched ones; unknown ids
+            # get refreshed_at in the future, i.e. they back off
+            for ids, refreshed_at in ((set(due) - unknown, now), (unknown, now + UNKNOWN_BACKOFF)):
+                if ids:
+                    Fixture.query.filter(Fixture.fixture_id.in_(ids)).update(
+                        {Fixture.refreshed_at: refreshed_at}, synchronize_session=False
+                    )
+            db.session.commit()
+
+            self.stats['fetched'] += len(batch['resolved'])
+            self.stats['changed'] += len(changed)
+            if changed:
+                feed_cache.invalidate_many(subscriber_usernames(fixture_ids=changed))
+            return changed
+
+
+def main():
+    """
+    Run the refresher standalone: the production service (gunicorn workers
+    never start it), or when the web app runs with FIXTURE_REFRESHER=False
+    """
+    from app import create_app
+    from services import worker_lock
+    from services.football_service import football_api
+    if not worker_lock.acquire('fixture_refresher'):
+        raise SystemExit('Fixture refresher already runs in another process')
+    app = create_app()
+    refresher = FixtureRefresher(app, football_api)
+    print(f"Fixture refresher running every {refresher.tick}s (Ctrl+C to stop)")
+    while True:
+        try:
+            changed = refresher.run_once()
+            if changed:
+                print(f"Refreshed {len(changed)} changed fixtures")
+        except Exception as e:
+            print(f"Fixture refresher error: {e}")
+        time.sleep(refresher.tick)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Fixture Store
+Shared, deduplicated storage of API fixture payloads (the `fixtures` table).
+Every SavedFixture points at one row here, so refreshing a fixture once
+updates it (and its rendered VEVENT) for all subscribers.
+"""
+from extensions import db
+from models import User, Fixture, SavedFixture
+from services.ics_renderer import fixture_fragment
+
+# Stay well below SQLite's bound-parameter limit for IN (...) lookups
+LOOKUP_CHUNK = 500
+
+
+def get_fixtures(fixture_ids):
+    """Load stored fixtures by id. Returns {fixture_id: Fixture}"""
+    ids = list(set(fixture_ids))
+    found = {}
+    for i in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[i:i + LOOKUP_CHUNK]
+        for row in Fixture.query.filter(Fixture.fixture_id.in_(chunk)).all():
+            found[row.fixture_id] = row
+    return found
+
+
+def upsert_fixtures(fixtures, overwrite=True):
+    """
+    Insert or update API fixture objects in the shared store (caller commits).
+
+    Args:
+        fixtures: list of API fixture objects
+        overwrite: update rows that already exist and mark them verified.
+            Pass False for payloads that come from clients rather than the
+            upstream API, so they can seed missing fixtures (unverified, kept
+            out of shared team feeds) but never replace authoritative data.
+
+    Returns:
+        tuple: ({fixture_id: Fixture}, [ids whose payload changed])
+    """
+    by_id = {}
+    for f in fixtures:
+        try:
+            by_id[int(f['fixture']['id'])] = f
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    rows = get_fixtures(by_id.keys())
+    changed = []
+    for fid, payload in by_id.items():
+        row = rows.get(fid)
+        if row is None:
+            row = rows[fid] = Fixture(fixture_id=fid)
+            db.session.add(row)
+        elif not overwrite:
+            continue
+        if row.apply_payload(payload):
+            fixture_fragment(row)  # Pre-render the shared VEVENT once per change
+            changed.append(fid)
+        if overwrite and not row.verified:
+            row.verified = True
+    return rows, changed
+
+
+def _insert_ignoring_duplicates(model):
+    """
+    INSERT that skips rows hitting a unique index, so a concurrent sync that
+    saved the same (user_id, fixture_id) first doesn't fail the batch.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return db.insert(model)
+    return insert(model).on_conflict_do_nothing()
+
+
+def save_for_user(user_id, fixture_ids):
+    """
+    Link fixtures to a user's calendar, skipping ones already saved (caller commits).
+
+    One query loads the user's saved ids and one batched INSERT adds the rest.
+    Returns the list of newly saved fixture ids.
+    """
+    return [fid for _, fid in save_for_users((user_id, fid) for fid in fixture_ids)]
+
+
+def save_for_users(pairs):
+    """
+    Bulk version of save_for_user for many users at once (caller commits).
+
+    Args:
+        pairs: iterable of (user_id, fixture_id)
+
+    Returns:
+        list: newly saved (user_id, fixture_id) pairs
+    """
+    wanted = list(dict.fromkeys(pairs))
+    if not wanted:
+        return []
+    user_ids = list({user_id for user_id, _ in wanted})
+    existing = set()
+    for i in range(0, len(user_ids), LOOKUP_CHUNK):
+        existing.update(
+            db.session.query(SavedFixture.user_id, SavedFixture.fixture_id)
+            .filter(SavedFixture.user_id.in_(user_ids[i:i + LOOKUP_CHUNK]))
+            .all()
+        )
+    new_pairs = [pair for pair in wanted if pair not in existing]
+    if new_pairs:
+        db.session.flush()  # Fixture rows must exist before rows referencing them
+        db.session.execute(
+            _insert_ignoring_duplicates(SavedFixture),
+            [{'user_id': user_id, 'fixture_id': fid} for user_id, fid in new_pairs]
+        )
+    return new_pairs
+
+
+def _plays(team_id):
+    return db.or_(Fixture.home_team_id == team_id, Fixture.away_team_id == team_id)
+
+
+def team_fixture_ids(team_id):
+    """Subquery of stored fixture ids where team_id plays home or away (indexed)"""
+    return db.select(Fixture.fixture_id).where(_plays(team_id))
+
+
+def team_feed_filter(team_id):
+    """
+    WHERE clause for a team's shared feed: fixtures it plays in whose payload
+    came from upstream. Client-seeded rows (/calendar/add) stay out of feeds
+    other users subscribe to.
+    """
+    return db.and_(_plays(team_id), Fixture.verified.is_(True))
+
+
+def team_feed_state(team_id, session=None):
+    """
+    Version of a team's feed fixtures (count and latest payload change) and
+    the (league_type, league_name) pairs they cover, in one grouped query.
+    The version changes whenever the team's feed would.
+
+    Returns:
+        tuple: (version, [(league_type, league_name)]), or (None, []) if none
+    """
+    rows = (session or db.session).execute(
+        db.select(Fixture.league_type, Fixture.league_name, db.func.count(), db.func.max(Fixture.updated_at))
+        .where(team_feed_filter(team_id))
+        .group_by(Fixture.league_type, Fixture.league_name)
+    ).all()
+    if not rows:
+        return None, []
+    count = sum(row[2] for row in rows)
+    updated_at = max((row[3] for row in rows if row[3] is not None), default=None)
+    return f"{count}-{updated_at or ''}", [(league_type, league_name) for league_type, league_name, _, _ in rows]
+
+
+def team_feed_version(team_id, session=None):
+    """Version of a team's feed (see team_feed_state), or None if it has no fixtures"""
+    return team_feed_state(team_id, session)[0]
+
+
+def remove_team_for_user(user_id, team_id):
+    """
+    Delete a user's saved fixtures involving a team in one indexed DELETE
+    (caller commits). Returns the number of rows removed.
+    """
+    return SavedFixture.query.filter(
+        SavedFixture.user_id == user_id,
+        SavedFixture.fixture_id.in_(team_fixture_ids(team_id))
+    ).delete(synchronize_session=False)
+
+
+def subscriber_usernames(fixture_ids=None, user_ids=None):
+    """Usernames of users who saved any of fixture_ids, or of the given user_ids"""
+    query = db.session.query(User.username)
+    if fixture_ids is not None:
+        query = query.join(SavedFixture, SavedFixture.user_id == User.id).filter(
+            SavedFixture.fixture_id.in_(list(fixture_ids))
+        )
+    if user_ids is not None:
+        query = query.filter(User.id.in_(list(user_ids)))
+    return [name for (name,) in query.distinct().all()]
+
+
+def persist_fragments(fixtures):
+    """
+    Write VEVENTs rendered on read-session rows back through the primary
+    (caller commits). Rows loaded by db.session are simply flushed as dirty.
+    """
+    rows = [{'fixture_id': f.fixture_id, 'vevent': f.vevent} for f in fixtures if f.vevent is not None]
+    if rows:
+        db.session.execute(db.update(Fixture), rows)
@@ -1,15 +1,151 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, TimeoutError as FuturesTimeout
 import requests
-from config import FOOTBALL_API_KEY, API_BASE_URL
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import (
+    FOOTBALL_API_KEY, API_BASE_URL, API_POOL_SIZE, API_CONNECT_TIMEOUT,
+    API_READ_TIMEOUT, API_MAX_RETRIES, API_RETRY_BACKOFF, API_BATCH_DEADLINE,
+    API_CACHE_MAX_BYTES, API_CACHE_PATH
+)
+from services.response_cache import ResponseCache
+from services.single_flight import SingleFlight
+
+# Upstream statuses worth retrying (rate limit + transient server errors)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Response cache TTLs in seconds (static data changes a few times per season)
+CACHE_TTL = {
+    'static': 7 * 24 * 3600,     # countries
+    'reference': 24 * 3600,      # leagues, teams
+    'fixtures': 10 * 60,         # next/last/season fixture lists
+    'live': 60                   # fixtures by id (refreshed around kickoff)
+}
 
 class FootballAPI:
-    def __init__(self):
+    def __init__(self, pool_size=API_POOL_SIZE, connect_timeout=API_CONNECT_TIMEOUT,
+                 read_timeout=API_READ_TIMEOUT, max_retries=API_MAX_RETRIES,
+                 retry_backoff=API_RETRY_BACKOFF):
         self.api_key = FOOTBALL_API_KEY
         self.base_url = API_BASE_URL
         self.headers = {
             'x-apisports-key': self.api_key,
             'x-apisports-host': 'v3.football.api-sports.io'
         }
-    
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+
+        # One keep-alive session per instance: connections are reused across
+        # calls and threads instead of paying a TCP+TLS handshake every time.
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry, pool_block=True)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # Caps concurrent upstream requests at the pool size so we can measure
+        # how long callers wait for a free connection.
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._in_flight = 0
+        self._pool_wait = 0.0
+
+        # Worker threads for fan-out calls (chunked id lookups); sized to the
+        # connection pool so extra workers would only queue on the semaphore.
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='football-api')
+
+        self.cache = ResponseCache(API_CACHE_MAX_BYTES, API_CACHE_PATH or None)
+        # Concurrent misses for the same endpoint+params share one upstream request
+        self._inflight = SingleFlight()
+
+    def _get(self, path, params=None):
+        """GET an API-Sports endpoint, served from the response cache when fresh"""
+        key = ResponseCache.make_key(path, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        def fetch_and_cache():
+            data = self._fetch(path, params)
+            # API-Sports reports quota/validation problems in a 200 body - don't cache those
+            if not data.get('errors'):
+                self.cache.set(key, data, self._cache_ttl(path, params))
+            return data
+
+        return self._inflight.do(key, fetch_and_cache)
+
+    def _fetch(self, path, params=None):
+        """GET an API-Sports endpoint through the shared pool and return parsed JSON"""
+        wait_start = time.monotonic()
+        with self._slots:
+            waited = time.monotonic() - wait_start
+            with self._stats_lock:
+                self._requests += 1
+                self._in_flight += 1
+                self._pool_wait += waited
+            try:
+                response = self.session.get(f'{self.base_url}{path}', params=params, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json()
+            finally:
+                with self._stats_lock:
+                    self._in_flight -= 1
+
+    @staticmethod
+    def _cache_ttl(path, params):
+        """Pick a cache TTL for an endpoint + params combination"""
+        params = params or {}
+        if path == '/countries':
+            return CACHE_TTL['static']
+        if path in ('/leagues', '/teams'):
+            return CACHE_TTL['reference']
+        if path == '/fixtures' and 'ids' in params:
+            return CACHE_TTL['live']
+        return CACHE_TTL['fixtures']
+
+    def get_cache_stats(self):
+        """Response cache counters (hits, misses, evictions, bytes) plus coalesced requests"""
+        stats = self.cache.stats()
+        stats['single_flight'] = self._inflight.stats()
+        return stats
+
+    def get_pool_stats(self):
+        """Connection pool counters (reuse ratio, in-flight requests, pool wait time)"""
+        sent = new_conns = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    sent += pool.num_requests
+                    new_conns += pool.num_connections
+
+        with self._stats_lock:
+            requests_made = self._requests
+            in_flight = self._in_flight
+            pool_wait = self._pool_wait
+
+        return {
+            'pool_size': self.pool_size,
+            'requests': requests_made,
+            'in_flight': in_flight,
+            'connections_opened': new_conns,
+            'reuse_ratio': round(1 - new_conns / sent, 3) if sent else 0.0,
+            'pool_wait_seconds': round(pool_wait, 3),
+            'avg_pool_wait_ms': round(pool_wait * 1000 / requests_made, 2) if requests_made else 0.0
+        }
+
     def get_fixtures_by_team(self, team_id, next_n=10, last_n=None, season=None):
         """Get fixtures for a team (next, last, or by season)"""
         try:
@@ -17,7 +153,6 @@ class FootballAPI:
             if self.api_key == 'demo_key_12345':
                 return self._get_demo_fixtures()
             
-            url = f'{self.base_url}/fixtures'
             params = {'team': team_id}
             
             # Priority: Season > Last > Next
@@ -28,24 +163,68 @@ class FootballAPI:
             else:
                 params['next'] = next_n
                 
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get('/fixtures', params)
         except Exception as e:
             print(f'Error fetching fixtures: {str(e)}')
             return self._get_demo_fixtures()
     
+    def fetch_fixtures_for_teams(self, team_ids, next_n=10, deadline=API_BATCH_DEADLINE, on_result=None):
+        """
+        Fetch upcoming fixtures for several teams concurrently within one deadline.
+        on_result(team_id, fixtures or None), if given, is called as each team completes.
+
+        Returns:
+            dict: {'fixtures': {team_id: [fixtures]}, 'timed_out': [team_ids],
+                   'failed': [team_ids]} - late or failing teams are reported, not dropped silently.
+        """
+        result = {'fixtures': {}, 'timed_out': [], 'failed': []}
+        team_ids = list(dict.fromkeys(team_ids))
+        if not team_ids:
+            return result
+        if self.api_key == 'demo_key_12345':
+            result['fixtures'] = {tid: self._get_demo_fixtures()['response'] for tid in team_ids}
+            return result
+
+        futures = {
+            self._executor.submit(self._get, '/fixtures', {'team': tid, 'next': next_n}): tid
+            for tid in team_ids
+        }
+        pending = dict(futures)
+
+        def merge(future):
+            tid = pending.pop(future)
+            try:
+                result['fixtures'][tid] = future.result().get('response', [])
+            except Exception as e:
+                print(f'Error fetching fixtures for team {tid}: {str(e)}')
+                result['failed'].append(tid)
+            if on_result:
+                try:
+                    on_result(tid, result['fixtures'].get(tid))
+                except Exception as e:  # A progress callback must not lose the batch
+                    print(f'Error in fixture callback for team {tid}: {str(e)}')
+
+        try:
+            # Merge results as they arrive
+            for future in as_completed(futures, timeout=deadline):
+                merge(future)
+        except FuturesTimeout:
+            for future in list(pending):
+                if future.done():
+                    merge(future)  # Finished after the deadline hit, before this loop
+                else:
+                    future.cancel()
+                    result['timed_out'].append(pending.pop(future))
+            print(f'Team fixture fetch timed out after {deadline}s for teams {result["timed_out"]}')
+        return result
+
     def get_team_info(self, team_id):
         """Get team information"""
         try:
             if self.api_key == 'demo_key_12345':
                 return self._get_demo_team_info(team_id)
             
-            url = f'{self.base_url}/teams'
-            params = {'id': team_id}
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get('/teams', {'id': team_id})
         except Exception as e:
             print(f'Error fetching team info: {str(e)}')
             return self._get_demo_team_info(team_id)
@@ -56,10 +235,7 @@ class FootballAPI:
             if self.api_key == 'demo_key_12345':
                 return self._get_demo_countries()
             
-            url = f'{self.base_url}/countries'
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            return response.json()
+            return self._get('/countries')
         except Exception as e:
             print(f'Error fetching countries: {str(e)}')
             return self._get_demo_countries()
@@ -70,11 +246,7 @@ class FootballAPI:
             if self.api_key == 'demo_key_12345':
                 return self._get_demo_leagues(country)
             
-            url = f'{self.base_url}/leagues'
-            params = {'country': country}
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get('/leagues', {'country': country})
         except Exception as e:
             print(f'Error fetching leagues: {str(e)}')
             return self._get_demo_leagues(country)
@@ -85,41 +257,61 @@ class FootballAPI:
             if self.api_key == 'demo_key_12345':
                 return self._get_demo_teams(league_id)
             
-            url = f'{self.base_url}/teams'
-            params = {'league': league_id, 'season': season}
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get('/teams', {'league': league_id, 'season': season})
         except Exception as e:
             print(f'Error fetching teams: {str(e)}')
             return self._get_demo_teams(league_id)
 
     def get_fixtures_by_ids(self, ids_list):
         """Get fixtures by list of IDs (chunked to avoid URL limits)"""
-        if not ids_list: return []
-        if self.api_key == 'demo_key_12345': return [] # No mock for specific IDs yet
+        return self.fetch_fixtures_by_ids(ids_list)['response']
 
-        try:
-            all_fixtures = []
-            chunk_size = 20  # API-Sports recommendation
-            
-            for i in range(0, len(ids_list), chunk_size):
-                chunk = ids_list[i:i + chunk_size]
-                ids_str = '-'.join(map(str, chunk))
-                
-                url = f'{self.base_url}/fixtures'
-                params = {'ids': ids_str}
-                
-                response = requests.get(url, headers=self.headers, params=params)
-                response.raise_for_status()
-                data = response.json()
-                if 'response' in data:
-                    all_fixtures.extend(data['response'])
-            
-            return all_fixtures
-        except Exception as e:
-            print(f'Error fetching fixture IDs: {str(e)}')
-            return []
+    def fetch_fixtures_by_ids(self, ids_list, deadline=API_BATCH_DEADLINE):
+        """
+        Fetch fixtures by ID with the 20-id chunks requested in parallel.
+
+        A failed or late chunk only loses its own ids; everything that arrived
+        before the deadline is kept.
+
+        Returns:
+            dict: {'response': [fixtures], 'resolved': [ids], 'missing': [ids],
+            'unknown': [ids]} where 'missing' ids should fall back to stale
+            local data, and 'unknown' are the missing ids upstream answered
+            for without returning them (not a timeout or error).
+        """
+        result = {'response': [], 'resolved': [], 'missing': [], 'unknown': []}
+        if not ids_list: return result
+        ids = sorted(set(ids_list))
+        if self.api_key == 'demo_key_12345':  # No mock for specific IDs yet
+            result['missing'] = ids
+            return result
+
+        chunk_size = 20  # API-Sports recommendation
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        futures = {
+            self._executor.submit(self._get, '/fixtures', {'ids': '-'.join(map(str, chunk))}): chunk
+            for chunk in chunks
+        }
+        done, not_done = wait(futures, timeout=deadline)
+
+        for future in not_done:
+            future.cancel()
+            print(f'Fixture chunk timed out after {deadline}s: {futures[future][0]}..{futures[future][-1]}')
+
+        answered = set()
+        for future in done:
+            try:
+                result['response'].extend(future.result().get('response', []))
+                answered.update(futures[future])
+            except Exception as e:
+                chunk = futures[future]
+                print(f'Error fetching fixture IDs {chunk[0]}..{chunk[-1]}: {str(e)}')
+
+        resolved = {f['fixture']['id'] for f in result['response']}
+        result['resolved'] = sorted(resolved)
+        result['missing'] = [fid for fid in ids if fid not in resolved]
+        result['unknown'] = [fid for fid in result['missing'] if fid in answered]
+        return result
 
     def search_teams(self, query):
         """Search teams by name"""
@@ -127,11 +319,7 @@ class FootballAPI:
             if self.api_key == 'demo_key_12345':
                 return self._get_demo_teams_search(query)
             
-            url = f'{self.base_url}/teams'
-            params = {'search': query}
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self._get('/teams', {'search': query})
         except Exception as e:
             print(f'Error searching teams: {str(e)}')
             return self._get_demo_teams_search(query)
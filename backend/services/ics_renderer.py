@@ -0,0 +1,114 @@
+"""
+ICS Renderer
+Renders one VEVENT block per fixture and assembles calendars from them.
+
+A fixture's VEVENT is identical for every subscriber (DTSTAMP is the time
+the fixture last changed), so it is rendered once, stored on the Fixture
+row and only re-rendered when the fixture's payload changes. Building a
+user's feed is then a join over stored fragments.
+"""
+from datetime import datetime, timedelta, timezone
+
+CALENDAR_HEADER = "\n".join([
+    "BEGIN:VCALENDAR",
+    "VERSION:2.0",
+    "PRODID:-//Match Calendar//MatchDayByTM//EN",
+    "X-WR-CALNAME:MatchDayByTM",
+    "CALSCALE:GREGORIAN",
+    "METHOD:PUBLISH"
+])
+CALENDAR_FOOTER = "END:VCALENDAR"
+EMPTY_CALENDAR = "BEGIN:VCALENDAR\nVERSION:2.0\nEND:VCALENDAR"
+
+MATCH_DURATION = timedelta(hours=2)  # Assume 2 hours duration
+
+
+def _ics_time(dt):
+    # ICS format: YYYYMMDDTHHMMSSZ
+    return dt.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _ics_text(value):
+    """Escape a TEXT property value (RFC 5545 3.3.11) so payload strings can't add lines or properties"""
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n'))
+
+
+def render_vevent(f, dtstamp):
+    """Render an API fixture object as a VEVENT block"""
+    kickoff = datetime.fromisoformat(f['fixture']['date'].replace('Z', '+00:00'))
+    if kickoff.tzinfo is None:
+        kickoff = kickoff.replace(tzinfo=timezone.utc)
+
+    uid = f"{int(f['fixture']['id'])}@matchdaybytm"
+
+    # Add Status to summary if LIVE or FT
+    status = f['fixture']['status']['short']
+    score = ""
+    status_prefix = ""
+
+    if status == 'PST':
+        status_prefix = "⚠️ POSTPONED: "
+    elif status in ['FT', '1H', '2H', 'HT']:
+        score = f" [{f['goals']['home']}-{f['goals']['away']}]"
+
+    summary = f"{status_prefix}⚽ {f['teams']['home']['name']} vs {f['teams']['away']['name']}{score}"
+
+    # Location Logic (Venue + City)
+    venue = f['fixture']['venue'].get('name') or "TBA"
+    city = f['fixture']['venue'].get('city')
+    location = f"{venue}, {city}" if city and venue != "TBA" else venue
+
+    description = f"{f['league']['name']} - {location}"
+
+    return "\n".join([
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{dtstamp.strftime('%Y%m%dT%H%M%SZ')}",
+        f"DTSTART:{_ics_time(kickoff)}",
+        f"DTEND:{_ics_time(kickoff + MATCH_DURATION)}",
+        f"SUMMARY:{_ics_text(summary)}",
+        f"DESCRIPTION:{_ics_text(description)}",
+        f"LOCATION:{_ics_text(location)}",
+        f"STATUS:{'CANCELLED' if status == 'PST' else 'CONFIRMED'}",
+        "END:VEVENT"
+    ])
+
+
+def fixture_fragment(fixture):
+    """
+    Stored VEVENT for a Fixture row, rendering it if missing (caller commits).
+    Returns '' for payloads that can't be rendered.
+    """
+    if fixture.vevent is None:
+        try:
+            fixture.vevent = render_vevent(fixture.data, fixture.updated_at or datetime.utcnow())
+        except Exception as e:
+            print(f"Error rendering fixture {fixture.fixture_id}: {e}")
+            fixture.vevent = ''
+    return fixture.vevent
+
+
+def assemble_calendar(fragments):
+    """Join pre-rendered VEVENT fragments into a full calendar"""
+    body = "\n".join(fragment for fragment in fragments if fragment)
+    if not body:
+        return f"{CALENDAR_HEADER}\n{CALENDAR_FOOTER}"
+    return f"{CALENDAR_HEADER}\n{body}\n{CALENDAR_FOOTER}"
+
+
+def stream_calendar(fragment_batches):
+    """
+    assemble_calendar for fragments arriving in batches: yields one chunk per
+    batch. Joined, the chunks equal assemble_calendar(all fragments), or
+    EMPTY_CALENDAR if there were no batches at all.
+    """
+    started = False
+    for fragments in fragment_batches:
+        if not started:
+            started = True
+            yield CALENDAR_HEADER
+        body = "\n".join(fragment for fragment in fragments if fragment)
+        if body:
+            yield f"\n{body}"
+    yield f"\n{CALENDAR_FOOTER}" if started else EMPTY_CALENDAR
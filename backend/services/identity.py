@@ -0,0 +1,140 @@
+"""
+Identity Cache
+Resolves the JWT caller to a compact user record (id, username) without a
+users-table query per request.
+
+current_identity() checks the request (flask.g), then a process-wide cache
+with a TTL, and only then the database. Cached records are dropped when
+the user row is updated or deleted through the ORM; changes made by other
+processes (e.g. admin.py) show up within IDENTITY_CACHE_TTL seconds.
+
+That lag is fine for reads but not for writes: SQLite doesn't enforce
+foreign keys, so rows could be inserted for a user another process just
+deleted. Write paths call confirm_identity() (or current_identity(confirm=True))
+right before inserting, which reads the users row itself.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import g
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from extensions import db
+from models import User
+from config import IDENTITY_CACHE_TTL, IDENTITY_CACHE_SIZE
+
+Identity = namedtuple('Identity', ['id', 'username'])
+
+
+class IdentityCache:
+    """LRU of user id -> Identity, each entry kept for at most ttl seconds"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (expires_at, Identity)
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self._stats['hits'] += 1
+                return entry[1]
+            if entry:
+                del self._entries[user_id]
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, identity):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[identity.id] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats, entries=len(self._entries),
+                        hit_ratio=round(self._stats['hits'] / lookups, 3) if lookups else None)
+
+
+identity_cache = IdentityCache(IDENTITY_CACHE_TTL, IDENTITY_CACHE_SIZE)
+
+
+def load_identity(user_id):
+    """Identity of user_id (cached), or None if the user doesn't exist"""
+    user_id = int(user_id)
+    identity = identity_cache.get(user_id)
+    if identity is None:
+        row = db.session.query(User.id, User.username).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        identity = Identity(*row)
+        identity_cache.put(identity)
+    return identity
+
+
+def confirm_identity(user_id):
+    """
+    Identity of user_id read from the database (not the cache), or None if
+    the user no longer exists. On PostgreSQL the row is share-locked until
+    the transaction ends, so a concurrent delete waits for the caller's commit.
+    """
+    user_id = int(user_id)
+    row = db.session.query(User.id, User.username).filter(User.id == user_id) \
+        .with_for_update(read=True).first()
+    if row is None:
+        identity_cache.discard(user_id)
+        return None
+    identity = Identity(*row)
+    identity_cache.put(identity)
+    return identity
+
+
+def current_identity(confirm=False):
+    """
+    Identity of the JWT caller, resolved once per request (call under @jwt_required).
+    confirm=True re-reads it with confirm_identity(), for routes that insert rows.
+    """
+    if confirm:
+        g.identity = confirm_identity(get_jwt_identity())
+    elif 'identity' not in g:
+        g.identity = load_identity(get_jwt_identity())
+    return g.identity
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    identity_cache.discard(target.id)
+    # Drop it again at commit, in case another request cached the old row meanwhile
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _discard_committed(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        identity_cache.discard(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back(session):
+    session.info.pop('changed_user_ids', None)
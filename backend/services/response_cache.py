@@ -0,0 +1,139 @@
+"""
+Response Cache
+Byte-bounded LRU cache for upstream API responses, with an optional
+SQLite file behind it so entries survive restarts.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, max_bytes, path=None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, body bytes)
+        self._bytes = 0
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS responses '
+                    '(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, body BLOB NOT NULL)'
+                )
+                self._db.execute('DELETE FROM responses WHERE expires_at < ?', (time.time(),))
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f'Response cache: persistent store disabled ({e})')
+                self._db = None
+
+    @staticmethod
+    def make_key(path, params=None):
+        """Stable key for an endpoint + params combination"""
+        if not params:
+            return path
+        query = '&'.join(f'{k}={params[k]}' for k in sorted(params))
+        return f'{path}?{query}'
+
+    def get(self, key):
+        """Return the cached object for key, or None on miss/expiry"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                expires_at, body = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return json.loads(body)
+                self._drop(key)
+                self._stats['expired'] += 1
+
+        row = self._disk_get(key)
+        if row and row[0] > now:
+            with self._lock:
+                self._stats['disk_hits'] += 1
+                self._store(key, row[0], row[1])
+            return json.loads(row[1])
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, key, value, ttl):
+        """Cache a JSON-serialisable value for ttl seconds"""
+        if ttl <= 0:
+            return
+        body = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store(key, expires_at, body)
+        self._disk_set(key, expires_at, body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._db:
+            with self._db_lock:
+                self._db.execute('DELETE FROM responses')
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes})
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        stats['persistent'] = self._db is not None
+        return stats
+
+    # --- Internal helpers (memory helpers expect self._lock to be held) ---
+
+    def _store(self, key, expires_at, body):
+        if len(body) > self.max_bytes:
+            return  # Never evict the whole cache for one oversized response
+        self._drop(key)
+        self._entries[key] = (expires_at, body)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._stats['evictions'] += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= len(entry[1])
+
+    def _disk_get(self, key):
+        if not self._db:
+            return None
+        try:
+            with self._db_lock:
+                return self._db.execute(
+                    'SELECT expires_at, body FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f'Response cache read error: {e}')
+            return None
+
+    def _disk_set(self, key, expires_at, body):
+        if not self._db:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses (key, expires_at, body) VALUES (?, ?, ?)',
+                    (key, expires_at, body)
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            print(f'Response cache write error: {e}')
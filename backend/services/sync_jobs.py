@@ -0,0 +1,164 @@
+"""
+Sync Jobs
+Runs favorites syncs off the request thread on a small local worker pool.
+
+Job state lives in the sync_jobs table, so a progress poll can land on any
+app process. A job is deduplicated per user across processes: while one is
+unfinished (unique index on user_id WHERE finished_at IS NULL), further
+submits for the same user return it instead of starting another. A job whose
+process died stops blocking its user once it has not reported progress for
+stale_after seconds.
+
+Progress is written on its own short transactions, never through db.session,
+so reporting a step doesn't commit the work's half-done session.
+"""
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, SyncJob
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Columns update() writes back from the in-process working copy
+PROGRESS_FIELDS = ('status', 'teams_total', 'teams_done', 'fixtures_added', 'errors', 'finished_at')
+
+
+class SyncJobManager:
+    def __init__(self, max_workers=4, keep_finished=3600, stale_after=900):
+        self.keep_finished = keep_finished  # seconds a finished job stays pollable
+        self.stale_after = stale_after  # seconds without progress before an unfinished job is abandoned
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sync-job')
+        self._lock = threading.Lock()
+        self._engines = {}  # job id -> engine, for jobs running in this process
+
+    def submit(self, user_id, work):
+        """
+        Queue work(job) for a user, or return the user's job already in progress.
+
+        work receives the job and reports progress through update(job, ...).
+        Needs an app context (the job row is written through db.engine).
+
+        Returns:
+            tuple: (job dict snapshot, created)
+        """
+        engine = db.engine
+        table = SyncJob.__table__
+        now = datetime.utcnow()
+
+        with engine.begin() as conn:
+            self._prune(conn, now)
+            self._abandon_stale(conn, user_id, now)
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'user_id': user_id,
+            'status': 'queued',
+            'teams_total': 0,
+            'teams_done': 0,
+            'fixtures_added': 0,
+            'errors': [],
+            'created_at': now,
+            'updated_at': now,
+            'finished_at': None
+        }
+        # The active job can finish between a failed insert and the lookup; retry then
+        for _ in range(3):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(table).values(_to_row(job)))
+                break
+            except IntegrityError:
+                with engine.connect() as conn:
+                    active = conn.execute(
+                        select(table).where(table.c.user_id == user_id, table.c.finished_at.is_(None))
+                    ).mappings().first()
+                if active:
+                    return _from_row(active), False
+        else:
+            raise RuntimeError(f"Could not queue a sync job for user {user_id}")
+
+        with self._lock:
+            self._engines[job['id']] = engine
+        snapshot = dict(job, errors=[])
+        self._executor.submit(self._run, job, work)
+        return snapshot, True
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if unknown/expired (needs an app context)"""
+        table = SyncJob.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(select(table).where(table.c.id == job_id)).mappings().first()
+        return _from_row(row) if row else None
+
+    def update(self, job, **fields):
+        """Set progress fields; 'error' appends to the job's error list"""
+        with self._lock:
+            error = fields.pop('error', None)
+            if error:
+                job['errors'].append(error)
+            job.update(fields)
+            job['updated_at'] = datetime.utcnow()
+            row = _to_row(job)
+            engine = self._engines.get(job['id'])
+        if engine is None:
+            return
+
+        table = SyncJob.__table__
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    update(table).where(table.c.id == job['id'])
+                    .values({k: row[k] for k in PROGRESS_FIELDS + ('updated_at',)})
+                )
+        except Exception as e:
+            # Progress is best effort; the job itself carries on
+            print(f"Error recording sync job {job['id']} progress: {e}")
+
+    def _run(self, job, work):
+        self.update(job, status='running')
+        try:
+            work(job)
+            status, error = 'done', None
+        except Exception as e:
+            print(f"Sync job {job['id']} failed: {e}")
+            status, error = 'failed', str(e)
+        # Status and finished_at land together, so a finished job never still blocks its user
+        self.update(job, status=status, error=error, finished_at=datetime.utcnow())
+        with self._lock:
+            self._engines.pop(job['id'], None)
+
+    def _prune(self, conn, now):
+        table = SyncJob.__table__
+        conn.execute(delete(table).where(table.c.finished_at < now - timedelta(seconds=self.keep_finished)))
+
+    def _abandon_stale(self, conn, user_id, now):
+        # The process running it died (deploy, crash); fail it so the user can start another
+        table = SyncJob.__table__
+        conn.execute(
+            update(table)
+            .where(table.c.user_id == user_id, table.c.finished_at.is_(None),
+                   table.c.updated_at < now - timedelta(seconds=self.stale_after))
+            .values(status='failed', finished_at=now,
+                    errors=json.dumps(['Sync stopped responding; start it again']))
+        )
+
+
+def _to_row(job):
+    row = dict(job)
+    row['errors'] = json.dumps(job['errors'])
+    return row
+
+
+def _from_row(row):
+    job = dict(row)
+    job['errors'] = json.loads(job['errors'] or '[]')
+    return job
+
+
+sync_jobs = SyncJobManager()
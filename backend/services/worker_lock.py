@@ -0,0 +1,36 @@
+"""
+Worker Lock
+Keeps a background worker (fixture refresher, fan-out sync) to one runner
+per machine, whether it runs inside `python app.py` or as its own service.
+
+The lock is an fcntl.flock on instance/<name>.lock, held for the life of
+the process and released by the OS when it exits (even on a crash).
+"""
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every caller runs
+    fcntl = None
+
+LOCK_DIR = os.path.join(os.getcwd(), 'instance')
+
+_held = {}
+
+
+def acquire(name):
+    """Take the named lock for this process. Returns False if another process holds it."""
+    if name in _held:
+        return True
+    if fcntl is None:
+        _held[name] = None
+        return True
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    f = open(os.path.join(LOCK_DIR, f"{name}.lock"), 'a')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _held[name] = f
+    return True
@@ -0,0 +1,93 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# Modules import each other as top-level packages (run from backend/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+@pytest.fixture(scope='session')
+def postgres_url():
+    """
+    Maintenance URL of a PostgreSQL server for the tests: TEST_POSTGRESQL_URL,
+    or a throwaway pgserver instance. Skips when neither is available.
+    """
+    import sqlalchemy as sa
+    url = os.getenv('TEST_POSTGRESQL_URL')
+    if url:
+        yield sa.engine.make_url(url)
+        return
+    try:
+        import pgserver
+        import psycopg2  # noqa: F401 (driver pinned below)
+    except ImportError:
+        pytest.skip('needs TEST_POSTGRESQL_URL or `pip install pgserver psycopg2-binary`')
+    import tempfile
+    with tempfile.TemporaryDirectory() as workdir:
+        server = pgserver.get_server(os.path.join(workdir, 'pgdata'), cleanup_mode='stop')
+        try:
+            # Pin the driver: newer SQLAlchemy releases default postgresql:// to psycopg 3
+            yield sa.engine.make_url(server.get_uri()).set(drivername='postgresql+psycopg2')
+        finally:
+            server.cleanup()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database_url(request, tmp_path):
+    """URL of an empty database for one test, on each supported backend"""
+    if request.param == 'sqlite':
+        yield f"sqlite:///{tmp_path / 'app.db'}"
+        return
+    import sqlalchemy as sa
+    server = request.getfixturevalue('postgres_url')
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    admin = sa.create_engine(server, isolation_level='AUTOCOMMIT')
+    with admin.connect() as conn:
+        conn.execute(sa.text(f'CREATE DATABASE "{name}"'))
+    try:
+        yield server.set(database=name).render_as_string(hide_password=False)
+    finally:
+        with admin.connect() as conn:
+            conn.execute(sa.text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+        admin.dispose()
+
+
+@pytest.fixture
+def make_app(database_url, tmp_path, monkeypatch):
+    """
+    Build the app on a fresh, migrated database (SQLite, then PostgreSQL) with
+    its feed cache under tmp_path. Keyword arguments are set as environment
+    variables first.
+    """
+    from extensions import db
+    from migrations import runner
+    from services import feed_cache
+    apps = []
+
+    def make(**env):
+        from app import create_app
+        monkeypatch.setenv('DATABASE_URL', database_url)
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        monkeypatch.setattr(feed_cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+        feed_cache._memory.clear()
+        app = create_app(check_schema=False)
+        with app.app_context():
+            runner.upgrade(db.engine, log=lambda message: None)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+    feed_cache._memory.clear()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
@@ -0,0 +1,260 @@
+"""ICS feed routes: caching, revalidation and rebuilds through the Flask test client"""
+import gzip
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import User, SavedFixture
+from services import feed_cache
+from services.fixture_store import upsert_fixtures, save_for_user
+
+
+def api_fixture(fixture_id, kickoff, league_type='League'):
+    return {'fixture': {'id': fixture_id, 'date': kickoff.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+                        'status': {'short': 'NS'}, 'venue': {'name': 'Ground', 'city': 'Town'}},
+            'league': {'id': 1, 'type': league_type, 'name': f'{league_type} One'},
+            'teams': {'home': {'id': 1, 'name': f'Home {fixture_id}'}, 'away': {'id': 2, 'name': 'Away'}},
+            'goals': {'home': None, 'away': None}}
+
+
+def seed_user(app, username='fan', fixtures=3):
+    """A user with that many saved fixtures. Returns the user's id."""
+    kickoff = datetime(2030, 1, 1, 15, 0)
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        stored, _ = upsert_fixtures([api_fixture(i, kickoff + timedelta(days=i)) for i in range(1, fixtures + 1)])
+        save_for_user(user.id, list(stored))
+        db.session.commit()
+        return user.id
+
+
+def decode(encoding, data):
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if encoding == 'br':
+        import brotli
+        return brotli.decompress(data)
+    return data
+
+
+def counts():
+    return {name: feed_cache.stats()[name] for name in ('memory_hits', 'disk_hits', 'stale_hits', 'misses')}
+
+
+def wait_until(check, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize('large', [False, True])  # From memory, or sent from disk in blocks
+@pytest.mark.parametrize('encoding', list(feed_cache.ENCODINGS) + [None])
+def test_conditional_get_per_encoding(app, monkeypatch, encoding, large):
+    import routes.calendar
+    if large:
+        monkeypatch.setattr(routes.calendar, 'FEED_LARGE_BYTES', 0)
+    seed_user(app)
+    client = app.test_client()
+    url = '/sync/MatchDayByTM/fan.ics'
+    accept = {'Accept-Encoding': encoding or 'identity'}
+    plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+
+    first = client.get(url, headers=accept)
+    assert first.status_code == 200
+    assert first.content_encoding == encoding
+    assert decode(encoding, first.get_data()) == plain.get_data()
+    assert 'Accept-Encoding' in first.vary
+    etag, _ = first.get_etag()
+    assert etag == (f"{plain.get_etag()[0]}-{encoding}" if encoding else plain.get_etag()[0])
+
+    by_etag = client.get(url, headers=dict(accept, **{'If-None-Match': first.headers['ETag']}))
+    assert by_etag.status_code == 304 and by_etag.get_data() == b''
+    assert by_etag.headers['ETag'] == first.headers['ETag'] and 'Accept-Encoding' in by_etag.vary
+    by_date = client.get(url, headers=dict(accept, **{'If-Modified-Since': first.headers['Last-Modified']}))
+    assert by_date.status_code == 304
+
+    if encoding:
+        # Another representation's ETag doesn't validate this one
+        other = client.get(url, headers=dict(accept, **{'If-None-Match': plain.headers['ETag']}))
+        assert other.status_code == 200 and other.content_encoding == encoding
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip', 'gzip'),
+    ('gzip;q=0, identity', None),
+    ('identity', None),
+    ('compress', None),
+    ('*', next(iter(feed_cache.ENCODINGS))),
+])
+def test_accept_encoding_negotiation(app, accept, expected):
+    seed_user(app)
+    response = app.test_client().get('/sync/MatchDayByTM/fan.ics', headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert response.content_encoding == expected
+    assert response.vary.as_set() == {'accept-encoding'}
+    assert decode(expected, response.get_data()).count(b'BEGIN:VEVENT') == 3
+
+
+def test_memory_tier_is_bounded_and_checks_the_file(app, monkeypatch):
+    seed_user(app, 'fan')
+    seed_user(app, 'other')
+    client = app.test_client()
+    feed = client.get('/sync/MatchDayByTM/fan.ics').get_data()
+
+    before = counts()
+    assert client.get('/sync/MatchDayByTM/fan.ics').get_data() == feed
+    assert counts()['memory_hits'] == before['memory_hits'] + 1
+
+    # Rewritten by another worker: the memory copy no longer matches the file
+    path = feed_cache.cache_path('fan')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    before = counts()
+    assert client.get('/sync/MatchDayByTM/fan.ics').get_data() == feed
+    assert counts()['disk_hits'] == before['disk_hits'] + 1
+    client.get('/sync/MatchDayByTM/fan.ics')
+    assert counts()['memory_hits'] == before['memory_hits'] + 1  # Promoted again
+
+    # Room for one feed: polling the other user's evicts fan's
+    _, used = feed_cache._memory.usage()
+    monkeypatch.setattr(feed_cache._memory, 'max_bytes', used + 1)
+    evictions = feed_cache._memory.evictions
+    client.get('/sync/MatchDayByTM/other.ics')
+    assert feed_cache._memory.evictions == evictions + 1
+    assert feed_cache._memory.usage()[1] <= used + 1
+    before = counts()
+    assert client.get('/sync/MatchDayByTM/fan.ics').get_data() == feed
+    assert counts()['disk_hits'] == before['disk_hits'] + 1
+
+
+def test_stale_feed_is_served_while_it_is_rebuilt(app, monkeypatch):
+    import routes.calendar
+    monkeypatch.setattr(routes.calendar, 'FEED_STALE_WAIT', 0.05)
+    user_id = seed_user(app)
+    client = app.test_client()
+    url = '/sync/MatchDayByTM/fan.ics'
+    old = client.get(url)
+
+    release = threading.Event()
+    feed_chunks = routes.calendar._feed_chunks
+
+    def slow_chunks(user_id):
+        release.wait(5)
+        yield from feed_chunks(user_id)
+
+    monkeypatch.setattr(routes.calendar, '_feed_chunks', slow_chunks)
+    with app.app_context():
+        stored, _ = upsert_fixtures([api_fixture(4, datetime(2030, 2, 1, 15, 0))])
+        save_for_user(user_id, list(stored))
+        db.session.commit()
+    feed_cache.invalidate('fan')
+
+    started = time.monotonic()
+    stale = client.get(url)
+    assert time.monotonic() - started < 1
+    assert stale.status_code == 200 and stale.get_data() == old.get_data()
+    assert stale.headers['ETag'] == old.headers['ETag']
+    assert stale.cache_control.max_age == 0  # Clients shouldn't keep the old copy
+
+    release.set()
+    wait_until(lambda: feed_cache.lookup('fan') is not None)
+    fresh = client.get(url)
+    assert fresh.get_data().count(b'BEGIN:VEVENT') == 4
+    assert fresh.headers['ETag'] != old.headers['ETag']
+    assert fresh.cache_control.max_age == feed_cache.FEED_MAX_AGE
+
+
+def test_feed_is_gone_once_its_user_is(app, monkeypatch):
+    import routes.calendar
+    monkeypatch.setattr(routes.calendar, 'FEED_STALE_WAIT', 5)  # The rebuild answers, not the stale copy
+    user_id = seed_user(app)
+    client = app.test_client()
+    assert client.get('/sync/MatchDayByTM/fan.ics').status_code == 200
+    assert client.get('/sync/MatchDayByTM/nobody.ics').status_code == 404
+
+    with app.app_context():
+        SavedFixture.query.filter_by(user_id=user_id).delete()
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+    feed_cache.invalidate('fan')
+
+    assert client.get('/sync/MatchDayByTM/fan.ics').status_code == 404
+
+
+def test_slow_client_gets_the_whole_feed(make_app, monkeypatch):
+    import routes.calendar
+    app = make_app(DB_READ_STATEMENT_TIMEOUT_MS=50)
+    monkeypatch.setattr(routes.calendar, 'FEED_STREAM_BATCH', 50)
+    seed_user(app, fixtures=1000)
+
+    response = app.test_client().get('/sync/MatchDayByTM/fan.ics', buffered=False)
+    body = b''
+    for chunk in response.response:
+        body += chunk
+        time.sleep(0.02)  # Slower overall than the read statement timeout
+    response.close()
+
+    assert response.status_code == 200
+    assert body.count(b'BEGIN:VEVENT') == 1000
+    assert body.endswith(b'END:VCALENDAR')
+
+
+def test_stalled_client_does_not_hold_up_other_polls(make_app, monkeypatch):
+    import routes.calendar
+    app = make_app()
+    monkeypatch.setattr(routes.calendar, 'FEED_STREAM_BATCH', 50)
+    seed_user(app, fixtures=200)
+    client = app.test_client()
+
+    stalled = client.get('/sync/MatchDayByTM/fan.ics', buffered=False)
+    next(iter(stalled.response))  # Reads one chunk, then stops
+    started = time.monotonic()
+    other = []
+    poll = threading.Thread(target=lambda: other.append(app.test_client().get('/sync/MatchDayByTM/fan.ics')))
+    poll.daemon = True
+    poll.start()
+    poll.join(timeout=5)
+    stalled.close()
+
+    assert other and other[0].status_code == 200
+    assert time.monotonic() - started < 5
+    assert other[0].get_data().count(b'BEGIN:VEVENT') == 200
+
+
+@pytest.mark.parametrize('read_pool', ['True', 'False'])  # read bind, or everything on db.session
+def test_first_render_loads_payloads_in_the_batch_query(make_app, monkeypatch, read_pool):
+    import routes.calendar
+    from sqlalchemy import event
+    from models import Fixture
+    app = make_app(DB_READ_POOL=read_pool)
+    monkeypatch.setattr(routes.calendar, 'FEED_STREAM_BATCH', 50)
+    seed_user(app, fixtures=300)
+    with app.app_context():
+        db.session.query(Fixture).update({Fixture.vevent: None})  # e.g. after migration v005
+        db.session.commit()
+        engines = list(db.engines.values())
+
+    statements = []
+    count = lambda *args: statements.append(args[2])
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count)
+    try:
+        body = app.test_client().get('/sync/MatchDayByTM/fan.ics').get_data()
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', count)
+
+    assert body.count(b'BEGIN:VEVENT') == 300
+    assert len(statements) < 30, statements  # Not one payload SELECT per fixture
+    with app.app_context():
+        assert db.session.query(Fixture).filter(Fixture.vevent.is_(None)).count() == 0
@@ -0,0 +1,77 @@
+"""Feed cache: manifest updates across processes, and where feed keys land on disk"""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from services import feed_cache
+
+PROCESSES = 4
+RECORDS = 50
+
+
+def add_records(worker):
+    for i in range(RECORDS):
+        feed_cache._update_manifest('aa', {f"user-{worker}-{i}": {'bytes': 1, 'stored_at': 0}})
+
+
+@pytest.mark.skipif(feed_cache.fcntl is None, reason='needs fcntl')
+def test_concurrent_processes_do_not_lose_manifest_updates(tmp_path, monkeypatch):
+    monkeypatch.setattr(feed_cache, 'CACHE_DIR', str(tmp_path))
+    (tmp_path / 'aa').mkdir()
+    context = multiprocessing.get_context('fork')  # workers inherit the patched CACHE_DIR
+    workers = [context.Process(target=add_records, args=(w,)) for w in range(PROCESSES)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+
+    assert all(p.exitcode == 0 for p in workers)
+    assert len(feed_cache._read_manifest('aa')) == PROCESSES * RECORDS
+
+
+def hold_shard_lock(held, seconds):
+    with feed_cache._shard_lock('aa'):
+        held.set()
+        time.sleep(seconds)
+
+
+@pytest.mark.skipif(feed_cache.fcntl is None, reason='needs fcntl')
+def test_clear_waits_for_other_processes_shard_locks(tmp_path, monkeypatch):
+    monkeypatch.setattr(feed_cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    context = multiprocessing.get_context('fork')
+    held = context.Event()
+    worker = context.Process(target=hold_shard_lock, args=(held, 0.3))
+    worker.start()
+    assert held.wait(5)
+
+    started = time.monotonic()
+    feed_cache.clear()
+    waited = time.monotonic() - started
+    worker.join()
+    assert waited >= 0.2
+
+
+@pytest.mark.parametrize('username', ['../../outside', '..', 'teams', '.tmp-x', 'a/b', 'ü' * 80])
+def test_usernames_stay_in_their_own_file_in_the_cache(tmp_path, monkeypatch, username):
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setattr(feed_cache, 'CACHE_DIR', str(cache_dir))
+    feed_cache._memory.clear()
+    team = feed_cache.cache_path('teams/1/all')
+
+    path = feed_cache.cache_path(username)
+    assert os.path.dirname(path) == str(cache_dir / feed_cache._shard(username))
+    assert path != team and len(os.path.basename(path)) <= feed_cache.MAX_NAME_CHARS + len('.ics')
+
+    feed_cache.store(username, ['BEGIN:VCALENDAR'])
+    assert feed_cache.load(feed_cache.lookup(username))['body'] == b'BEGIN:VCALENDAR'
+    feed_cache.remove(username)
+    assert feed_cache.lookup(username) is None
+    assert [p.name for p in tmp_path.iterdir()] == ['cache']
+
+
+def test_team_keys_keep_their_layout(tmp_path, monkeypatch):
+    monkeypatch.setattr(feed_cache, 'CACHE_DIR', str(tmp_path))
+    path = feed_cache.cache_path('teams/33/0123456789ab')
+    assert path == os.path.join(str(tmp_path), feed_cache._shard('teams/33/0123456789ab'), 'teams', '33', '0123456789ab.ics')
@@ -0,0 +1,85 @@
+"""Compiled subscription filters must decide exactly like the original helper"""
+import json
+
+import pytest
+
+from services.filters import compile_filters, should_include_fixture
+
+
+def legacy_should_include(fixture, filters):
+    """The per-fixture check the compiled predicates replaced"""
+    if not filters:
+        return True
+    if 'All' in filters:
+        return True
+    league_type = fixture['league']['type']
+    league_name = fixture['league']['name']
+    if 'League' in filters and league_type == 'League':
+        return True
+    if 'Cup' in filters and league_type == 'Cup':
+        return True
+    for keyword in filters:
+        if keyword not in ('League', 'Cup', 'All') and keyword in league_name:
+            return True
+    return False
+
+
+def fixture(league_type, name):
+    return {'league': {'type': league_type, 'name': name}}
+
+
+FIXTURES = [
+    fixture('League', 'Premier League'),
+    fixture('Cup', 'FA Cup'),
+    fixture('Cup', 'UEFA Champions League'),
+    fixture('League', 'Ligat ha\'Al'),
+    fixture('Cup', 'State Cup'),
+]
+
+FILTERS = [
+    None,
+    [],
+    ['All'],
+    ['All', 'Cup'],
+    ['League'],
+    ['Cup'],
+    ['League', 'Cup'],
+    ['Champions League'],
+    ['Cup', 'Ligat'],
+    ['League', 'Champions', 'State'],
+    ['Europa League'],
+]
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_matches_legacy_helper(filters):
+    for f in FIXTURES:
+        expected = legacy_should_include(f, filters)
+        assert compile_filters(filters)(f) is expected
+        assert should_include_fixture(f, filters) is expected
+        # Stored form: JSON string in FavoriteTeam.filters (None/empty = no filters)
+        stored = json.dumps(filters) if filters else None
+        assert compile_filters(stored)(f) is expected
+
+
+@pytest.mark.parametrize('filters', [None, [], ['All'], ['League', 'All']])
+def test_no_filters_accept_fixtures_without_league_type(filters):
+    demo = {'league': {'name': 'Premier League'}}
+    assert legacy_should_include(demo, filters) is True
+    assert compile_filters(filters)(demo) is True
+
+
+def test_missing_league_type_falls_back_to_keywords():
+    demo = {'league': {'name': 'UEFA Champions League'}}
+    assert compile_filters(['Cup', 'Champions'])(demo) is True
+    assert compile_filters(['League', 'Cup'])(demo) is False
+    assert compile_filters(['Cup'])({'league': {}}) is False
+
+
+def test_predicates_are_shared():
+    assert compile_filters('["League", "Cup"]') is compile_filters('["League", "Cup"]')
+    assert compile_filters(['League', 'Cup']) is compile_filters(['League', 'Cup'])
+
+
+def test_invalid_json_means_no_filters():
+    assert compile_filters('not json').include_all
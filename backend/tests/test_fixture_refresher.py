@@ -0,0 +1,112 @@
+"""refresh_interval: how often a stored fixture is re-fetched"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.fixture_refresher import refresh_interval, SETTLE_WINDOW
+
+NOW = datetime(2025, 3, 1, 12, 0)
+
+
+@pytest.mark.parametrize('status', ['1H', 'HT', '2H', 'ET', 'P', 'LIVE'])
+def test_live_matches_every_minute(status):
+    assert refresh_interval(status, NOW - timedelta(minutes=30), NOW) == timedelta(minutes=1)
+
+
+def test_finished_matches_settle_then_stop():
+    assert refresh_interval('FT', NOW - timedelta(hours=2), NOW) == timedelta(hours=1)
+    assert refresh_interval('FT', NOW - SETTLE_WINDOW - timedelta(minutes=1), NOW) is None
+    assert refresh_interval('PEN', None, NOW) is None
+
+
+@pytest.mark.parametrize('status', ['PST', 'TBD'])
+def test_postponed_twice_a_day(status):
+    assert refresh_interval(status, NOW + timedelta(hours=1), NOW) == timedelta(hours=12)
+
+
+def test_unknown_kickoff_twice_a_day():
+    assert refresh_interval('NS', None, NOW) == timedelta(hours=12)
+
+
+@pytest.mark.parametrize('until_kickoff, expected', [
+    (timedelta(days=30), timedelta(hours=24)),
+    (timedelta(days=7), timedelta(hours=24)),
+    (timedelta(days=3), timedelta(hours=6)),
+    (timedelta(hours=12), timedelta(minutes=30)),
+    (timedelta(hours=2), timedelta(minutes=5)),
+    (timedelta(0), timedelta(minutes=1)),
+    (-timedelta(minutes=10), timedelta(minutes=1)),  # should have started: still NS upstream
+])
+def test_scheduled_matches_speed_up_towards_kickoff(until_kickoff, expected):
+    assert refresh_interval('NS', NOW + until_kickoff, NOW) == expected
+
+
+class FakeAPI:
+    """Upstream that knows only some ids"""
+
+    def __init__(self, known):
+        self.known = known
+        self.requested = []
+
+    def fetch_fixtures_by_ids(self, ids):
+        self.requested.append(sorted(ids))
+        found = [fid for fid in ids if fid in self.known]
+        return {'response': [self.known[fid] for fid in found], 'resolved': sorted(found),
+                'missing': sorted(set(ids) - set(found)), 'unknown': sorted(set(ids) - set(found))}
+
+
+def api_fixture(fixture_id, kickoff, status='NS'):
+    return {'fixture': {'id': fixture_id, 'date': kickoff.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+                        'status': {'short': status}, 'venue': {}},
+            'league': {'id': 1, 'type': 'League', 'name': 'Premier League'},
+            'teams': {'home': {'id': 1, 'name': 'A'}, 'away': {'id': 2, 'name': 'B'}},
+            'goals': {'home': None, 'away': None}}
+
+
+def test_unknown_ids_back_off_instead_of_starving_real_fixtures(make_app):
+    from extensions import db
+    from models import User, Fixture, SavedFixture
+    from services.fixture_refresher import FixtureRefresher
+
+    app = make_app()
+    now = datetime.utcnow()
+    stale = now - timedelta(days=2)
+    with app.app_context():
+        db.session.add(User(id=1, username='u', email='u@example.com', password_hash='x'))
+        # Bogus "live" ids sort ahead of everything; the real fixture kicks off in 2 hours
+        rows = [{'fixture_id': i, 'payload': '{}', 'status': '1H', 'kickoff_at': now, 'refreshed_at': stale}
+                for i in range(1, 4)]
+        rows.append({'fixture_id': 100, 'payload': '{}', 'status': 'NS',
+                     'kickoff_at': now + timedelta(hours=2), 'refreshed_at': stale})
+        db.session.execute(db.insert(Fixture), rows)
+        db.session.execute(db.insert(SavedFixture), [{'user_id': 1, 'fixture_id': r['fixture_id']} for r in rows])
+        db.session.commit()
+
+    api = FakeAPI({100: api_fixture(100, now + timedelta(hours=2))})
+    refresher = FixtureRefresher(app, api, batch_size=3)
+    refresher.run_once()
+    refresher.run_once()
+
+    assert api.requested == [[1, 2, 3], [100]]
+    with app.app_context():
+        assert refresher.due_fixture_ids(now + timedelta(minutes=4)) == []
+        backed_off = db.session.get(Fixture, 1).refreshed_at
+        assert backed_off > now + timedelta(hours=5)
+
+
+def test_team_feed_fixtures_are_tracked_without_subscribers(make_app):
+    from extensions import db
+    from models import Fixture
+    from services.fixture_refresher import FixtureRefresher
+
+    app = make_app()
+    now = datetime.utcnow()
+    with app.app_context():
+        # Nobody saved either; only the upstream-sourced one is listed in team feeds
+        db.session.execute(db.insert(Fixture), [
+            {'fixture_id': fid, 'payload': '{}', 'status': 'NS', 'kickoff_at': now + timedelta(hours=2),
+             'refreshed_at': now - timedelta(days=1), 'verified': verified}
+            for fid, verified in ((1, True), (2, False))
+        ])
+        db.session.commit()
+        assert FixtureRefresher(app, FakeAPI({})).due_fixture_ids(now) == [1]
@@ -0,0 +1,55 @@
+"""FootballAPI.fetch_fixtures_for_teams: every team ends up fetched, failed or timed out"""
+import threading
+from concurrent.futures import wait, TimeoutError as FuturesTimeout
+
+import pytest
+
+from services import football_service
+from services.football_service import FootballAPI
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = FootballAPI()
+    api.api_key = 'test-key'
+    release = threading.Event()
+
+    def get(path, params):
+        team = params['team']
+        if team == 2:
+            raise RuntimeError('upstream error')
+        if team == 3:
+            release.wait(5)  # Still running at the deadline
+        return {'response': [{'team': team}]}
+
+    monkeypatch.setattr(api, '_get', get)
+    yield api
+    release.set()
+
+
+def test_teams_finishing_after_the_deadline_fired_are_kept(api, monkeypatch):
+    def late_as_completed(futures, timeout=None):
+        wait(futures, timeout=0.2)  # Teams 1 and 2 finish, but the timeout is raised first
+        raise FuturesTimeout()
+        yield
+
+    monkeypatch.setattr(football_service, 'as_completed', late_as_completed)
+    result = api.fetch_fixtures_for_teams([1, 2, 3], deadline=0.1)
+
+    assert result['fixtures'] == {1: [{'team': 1}]}
+    assert result['failed'] == [2]
+    assert result['timed_out'] == [3]
+
+
+def test_a_failing_callback_does_not_drop_the_batch(api):
+    seen = []
+
+    def on_result(team_id, fixtures):
+        seen.append(team_id)
+        raise ValueError('progress store down')
+
+    result = api.fetch_fixtures_for_teams([1, 2, 3], deadline=0.5, on_result=on_result)
+
+    assert result['fixtures'] == {1: [{'team': 1}]}
+    assert result['failed'] == [2] and result['timed_out'] == [3]
+    assert sorted(seen) == [1, 2]
@@ -0,0 +1,15 @@
+"""/api/health/caches: internal counters only for callers with HEALTH_TOKEN"""
+
+
+def test_cache_stats_are_disabled_without_a_token(app):
+    assert app.test_client().get('/api/health/caches').status_code == 404
+
+
+def test_cache_stats_need_the_token(make_app):
+    client = make_app(HEALTH_TOKEN='s3cret').test_client()
+    assert client.get('/api/health/caches').status_code == 404
+    assert client.get('/api/health/caches', headers={'Authorization': 'Bearer wrong'}).status_code == 404
+    response = client.get('/api/health/caches', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert {'feed_cache', 'identity_cache', 'db'} <= set(response.get_json())
+    assert client.get('/api/health').status_code == 200  # The public liveness check stays open
@@ -0,0 +1,45 @@
+"""ICS rendering: escaped text values; streamed and joined calendars must be identical"""
+from datetime import datetime
+
+import pytest
+
+from services.ics_renderer import EMPTY_CALENDAR, assemble_calendar, render_vevent, stream_calendar
+
+
+def vevent(i):
+    return f"BEGIN:VEVENT\nUID:{i}@matchdaybytm\nEND:VEVENT"
+
+
+@pytest.mark.parametrize('batches', [
+    [[]],
+    [[], []],
+    [[vevent(1)]],
+    [[vevent(1), vevent(2)], [vevent(3)]],
+    [[vevent(1), ''], [], ['', vevent(2)], ['']],  # unrenderable fixtures are ''
+    [[vevent(i) for i in range(j, j + 50)] for j in range(0, 500, 50)],
+])
+def test_stream_equals_assemble(batches):
+    fragments = [fragment for batch in batches for fragment in batch]
+    assert ''.join(stream_calendar(iter(batches))) == assemble_calendar(fragments)
+
+
+def test_no_batches_is_the_empty_calendar():
+    # Same body as a user without saved fixtures always got
+    assert ''.join(stream_calendar(iter([]))) == EMPTY_CALENDAR
+
+
+def test_stream_yields_one_chunk_per_batch_with_events():
+    chunks = list(stream_calendar([[vevent(1)], [], [vevent(2)]]))
+    assert len(chunks) == 4  # header, two batches, footer
+
+
+def test_text_values_cannot_add_lines_or_properties():
+    fixture = {'fixture': {'id': 1, 'date': '2030-01-01T15:00:00Z', 'status': {'short': 'NS'},
+                           'venue': {'name': 'Ground;X', 'city': 'Town\r\nX-INJECTED:1'}},
+               'league': {'name': 'A, B \\ C'},
+               'teams': {'home': {'name': 'Home\nEND:VEVENT'}, 'away': {'name': 'Away'}}}
+    lines = render_vevent(fixture, datetime(2030, 1, 1)).split('\n')
+    assert [line.split(':')[0] for line in lines] == [
+        'BEGIN', 'UID', 'DTSTAMP', 'DTSTART', 'DTEND', 'SUMMARY', 'DESCRIPTION', 'LOCATION', 'STATUS', 'END']
+    assert lines[5] == 'SUMMARY:⚽ Home\\nEND:VEVENT vs Away'
+    assert lines[6] == 'DESCRIPTION:A\\, B \\\\ C - Ground\\;X\\, Town\\nX-INJECTED:1'
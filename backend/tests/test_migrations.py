@@ -0,0 +1,45 @@
+"""Migration runner: concurrent upgrades apply each migration once"""
+import threading
+
+import sqlalchemy as sa
+
+from migrations.runner import upgrade, current_version, latest_version, schema_version
+
+
+def test_concurrent_upgrades_of_a_fresh_database(database_url):
+    engines = [sa.create_engine(database_url) for _ in range(4)]
+    barrier = threading.Barrier(len(engines))
+    applied, errors = [], []
+
+    def boot(engine):
+        barrier.wait()
+        try:
+            applied.append(upgrade(engine, log=lambda message: None))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=boot, args=(engine,)) for engine in engines]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    versions = sorted(v for result in applied for v in result)
+    assert versions == list(range(1, latest_version() + 1))  # each applied exactly once
+    assert current_version(engines[0]) == latest_version()
+    with engines[0].connect() as conn:
+        assert conn.execute(sa.select(sa.func.count()).select_from(schema_version)).scalar() == latest_version()
+    for engine in engines:
+        engine.dispose()
+
+
+def test_migrated_schema_has_the_models_indexes(database_url):
+    from models import db
+    engine = sa.create_engine(database_url)
+    upgrade(engine, log=lambda message: None)
+    inspector = sa.inspect(engine)
+    for table in db.metadata.sorted_tables:
+        declared = {index.name for index in table.indexes}
+        assert declared <= {index['name'] for index in inspector.get_indexes(table.name)}, table.name
+    engine.dispose()
@@ -0,0 +1,70 @@
+"""ResponseCache: byte-bounded LRU eviction, TTL expiry and the SQLite tier"""
+import json
+
+from services.response_cache import ResponseCache
+
+
+def size_of(value):
+    return len(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+
+def test_get_returns_a_copy_of_the_value():
+    cache = ResponseCache(max_bytes=1024)
+    cache.set('k', {'a': [1, 2]}, ttl=60)
+    value = cache.get('k')
+    assert value == {'a': [1, 2]}
+    value['a'].append(3)
+    assert cache.get('k') == {'a': [1, 2]}
+
+
+def test_least_recently_used_entry_is_evicted_by_bytes():
+    value = {'payload': 'x' * 20}
+    cache = ResponseCache(max_bytes=size_of(value) * 2)
+    cache.set('a', value, ttl=60)
+    cache.set('b', value, ttl=60)
+    assert cache.get('a') == value  # 'b' is now least recently used
+    cache.set('c', value, ttl=60)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == value and cache.get('c') == value
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] <= stats['max_bytes']
+
+
+def test_oversized_value_is_not_cached_and_evicts_nothing():
+    cache = ResponseCache(max_bytes=64)
+    cache.set('small', {'a': 1}, ttl=60)
+    cache.set('big', {'payload': 'x' * 100}, ttl=60)
+    assert cache.get('big') is None
+    assert cache.get('small') == {'a': 1}
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('services.response_cache.time.time', lambda: now[0])
+    cache = ResponseCache(max_bytes=1024)
+    cache.set('k', [1], ttl=10)
+    cache.set('skipped', [1], ttl=0)
+
+    now[0] += 9
+    assert cache.get('k') == [1]
+    now[0] += 2
+    assert cache.get('k') is None
+    assert cache.get('skipped') is None
+    stats = cache.stats()
+    assert stats['expired'] == 1 and stats['entries'] == 0 and stats['bytes'] == 0
+
+
+def test_sqlite_tier_survives_restarts_and_respects_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('services.response_cache.time.time', lambda: now[0])
+    path = str(tmp_path / 'api_cache.sqlite')
+    ResponseCache(max_bytes=1024, path=path).set('k', {'v': 1}, ttl=60)
+
+    restarted = ResponseCache(max_bytes=1024, path=path)
+    assert restarted.get('k') == {'v': 1}
+    assert restarted.stats()['disk_hits'] == 1
+
+    now[0] += 61
+    assert ResponseCache(max_bytes=1024, path=path).get('k') is None
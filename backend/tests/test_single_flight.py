@@ -0,0 +1,76 @@
+"""SingleFlight: one execution per key, shared result or error"""
+import threading
+import time
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+def run_concurrently(n, target):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(2)
+        return 'value'
+
+    leader = threading.Thread(target=flight.do, args=('k', work))
+    leader.start()
+    while flight.stats()['in_flight'] == 0:
+        time.sleep(0.001)
+    threading.Timer(0.05, release.set).start()
+    results, errors = run_concurrently(8, lambda: flight.do('k', work))
+    leader.join()
+
+    assert calls == [1]
+    assert results == ['value'] * 8 and not errors
+    assert flight.stats() == {'executed': 1, 'coalesced': 8, 'in_flight': 0}
+
+
+def test_error_is_raised_to_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(2)
+        raise ValueError('upstream down')
+
+    leader = threading.Thread(target=lambda: pytest.raises(ValueError, flight.do, 'k', fail))
+    leader.start()
+    while flight.stats()['in_flight'] == 0:
+        time.sleep(0.001)
+    threading.Timer(0.05, release.set).start()
+    results, errors = run_concurrently(4, lambda: flight.do('k', fail))
+    leader.join()
+
+    assert not results
+    assert len(errors) == 4 and all(isinstance(e, ValueError) for e in errors)
+
+
+def test_keys_are_independent_and_calls_are_not_cached():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.do('a', lambda: 3) == 3
+    assert flight.stats()['executed'] == 3
+
@@ -0,0 +1,76 @@
+"""SyncJobManager: jobs are shared through the database, not one process's memory"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import SyncJob
+from services.sync_jobs import SyncJobManager
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        yield app
+
+
+def wait_for(manager, job_id, status):
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job and job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def test_another_process_sees_progress_and_dedupes(app):
+    worker, other = SyncJobManager(max_workers=1), SyncJobManager(max_workers=1)  # two app processes
+    release = threading.Event()
+
+    def work(job):
+        worker.update(job, teams_total=2, teams_done=1, error='Team 7: timed out')
+        release.wait(5)
+        worker.update(job, teams_done=2, fixtures_added=5)
+
+    job, created = worker.submit(1, work)
+    assert created
+    seen = wait_for(other, job['id'], 'running')
+
+    again, created = other.submit(1, lambda job: None)
+    assert not created and again['id'] == job['id']
+
+    release.set()
+    done = wait_for(other, job['id'], 'done')
+    assert (done['teams_done'], done['fixtures_added'], done['errors']) == (2, 5, ['Team 7: timed out'])
+    assert done['finished_at'] is not None
+    assert seen['user_id'] == 1
+
+
+def test_failed_work_frees_the_user(app):
+    manager = SyncJobManager(max_workers=1)
+
+    def work(job):
+        raise RuntimeError('boom')
+
+    job, _ = manager.submit(1, work)
+    failed = wait_for(manager, job['id'], 'failed')
+    assert failed['errors'] == ['boom']
+
+    second, created = manager.submit(1, lambda job: None)
+    assert created and second['id'] != job['id']
+
+
+def test_job_of_a_dead_process_is_abandoned(app):
+    manager = SyncJobManager(max_workers=1, stale_after=60)
+    stalled = datetime.utcnow() - timedelta(minutes=5)
+    db.session.add(SyncJob(id='dead', user_id=1, status='running', created_at=stalled, updated_at=stalled))
+    db.session.commit()
+
+    job, created = manager.submit(1, lambda job: None)
+    assert created and job['id'] != 'dead'
+    assert manager.get('dead')['status'] == 'failed'
+    assert manager.get('unknown') is None
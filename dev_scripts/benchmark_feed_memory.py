@@ -0,0 +1,99 @@
+"""
+Peak Python memory of ICS feed generation vs. calendar size.
+
+Seeds one user per size with that many saved fixtures (pre-rendered
+VEVENTs) in a throwaway SQLite database, then measures with tracemalloc:
+  - cold: first poll, written from the DB into the cache file, then sent from it
+  - cached: a later poll of the cached feed (gzip)
+Memory should stay roughly flat as the calendar grows.
+
+    python dev_scripts/benchmark_feed_memory.py --sizes 1000 10000 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+VEVENT = "\n".join([
+    "BEGIN:VEVENT",
+    "UID:{id}@matchdaybytm",
+    "DTSTAMP:20250101T000000Z",
+    "DTSTART:20250301T150000Z",
+    "DTEND:20250301T170000Z",
+    "SUMMARY:⚽ Home Team {id} vs Away Team {id}",
+    "DESCRIPTION:Premier League - Stadium {id}, City",
+    "LOCATION:Stadium {id}, City",
+    "STATUS:CONFIRMED",
+    "END:VEVENT",
+])
+
+
+def seed(db, models, sizes):
+    User, Fixture, SavedFixture = models
+    fixture_id = 0
+    for user_id, size in enumerate(sizes, start=1):
+        db.session.execute(db.insert(User), [{'id': user_id, 'username': f"user{size}",
+                                              'email': f"user{size}@example.com", 'password_hash': 'x'}])
+        rows = []
+        for _ in range(size):
+            fixture_id += 1
+            rows.append({'fixture_id': fixture_id, 'payload': '{}', 'status': 'NS',
+                         'vevent': VEVENT.format(id=fixture_id)})
+        db.session.execute(db.insert(Fixture), rows)
+        db.session.execute(db.insert(SavedFixture), [{'user_id': user_id, 'fixture_id': row['fixture_id']}
+                                                     for row in rows])
+    db.session.commit()
+
+
+def measure(client, path, headers=None):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(path, headers=headers or {}, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return response.status_code, size, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)  # feed cache lives under ./instance
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'feeds.db')}",
+        'FIXTURE_REFRESHER': 'False',
+        'FANOUT_SYNC': 'False',
+    })
+    from app import create_app
+    from extensions import db
+    from models import User, Fixture, SavedFixture
+    from migrations import runner
+
+    app = create_app(check_schema=False)
+    with app.app_context():
+        runner.upgrade(db.engine, log=lambda message: None)
+        seed(db, (User, Fixture, SavedFixture), args.sizes)
+
+    client = app.test_client()
+    print(f"{'events':>8} {'feed MB':>8} {'cold peak MB':>13} {'cold s':>7} {'cached peak MB':>15} {'cached s':>9}")
+    for size in args.sizes:
+        path = f"/sync/MatchDayByTM/user{size}.ics"
+        status, body, cold_peak, cold_time = measure(client, path)
+        assert status == 200, status
+        status, _, cached_peak, cached_time = measure(client, path, {'Accept-Encoding': 'gzip'})
+        assert status == 200, status
+        print(f"{size:>8} {body / 2**20:>8.1f} {cold_peak / 2**20:>13.1f} {cold_time:>7.2f} "
+              f"{cached_peak / 2**20:>15.1f} {cached_time:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
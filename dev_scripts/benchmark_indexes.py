@@ -0,0 +1,142 @@
+"""
+Benchmark the hot query shapes before and after schema migration 003 (indexes).
+
+Builds a throwaway SQLite database at schema version 2 with the migration
+runner, seeds it, prints the query plan and median latency of each query,
+upgrades to the latest version and prints them again.
+
+    python dev_scripts/benchmark_indexes.py --users 20000 --saved-per-user 50
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from migrations import upgrade
+
+INDEX_MIGRATION = 3
+
+# name -> (sql, params factory); shapes mirror the app's queries
+def queries(args, now):
+    rand_user = lambda: random.randint(1, args.users)
+    return {
+        'saved by (user, fixture)': (
+            "SELECT id FROM saved_fixtures WHERE user_id = ? AND fixture_id = ?",
+            lambda: (rand_user(), random.randint(1, args.fixtures))),
+        'saved by user, newest first': (
+            "SELECT id, fixture_id, added_at FROM saved_fixtures WHERE user_id = ? ORDER BY added_at DESC",
+            lambda: (rand_user(),)),
+        'subscribers of fixture': (
+            "SELECT DISTINCT user_id FROM saved_fixtures WHERE fixture_id = ?",
+            lambda: (random.randint(1, args.fixtures),)),
+        'favorite by (user, team)': (
+            "SELECT id FROM favorite_teams WHERE user_id = ? AND team_id = ?",
+            lambda: (rand_user(), random.randint(1, args.teams))),
+        'user by username OR email': (
+            "SELECT id FROM users WHERE username = ? OR email = ?",
+            lambda: (f"user{rand_user()}", f"user{rand_user()}@example.com")),
+        'logins in last 24h by user': (
+            "SELECT username, email, COUNT(*) FROM login_logs WHERE timestamp >= ? "
+            "GROUP BY email, username ORDER BY username",
+            lambda: ((now - timedelta(days=1)).isoformat(' '),)),
+        'login history of username': (
+            "SELECT status, timestamp FROM login_logs WHERE username = ? AND timestamp >= ? "
+            "ORDER BY timestamp DESC",
+            lambda: (f"user{rand_user()}", (now - timedelta(days=30)).isoformat(' '))),
+    }
+
+def seed(conn, args, now):
+    cursor = conn.cursor()
+    when = lambda days: (now - timedelta(seconds=random.randint(0, days * 86400))).isoformat(' ')
+
+    cursor.executemany("INSERT INTO users VALUES (?,?,?,?,?,?)", (
+        (i, f"user{i}", f"user{i}@example.com", 'x', 0, when(365)) for i in range(1, args.users + 1)))
+    cursor.executemany("INSERT INTO fixtures (fixture_id, payload, home_team_id, away_team_id) VALUES (?,?,?,?)", (
+        (i, '{}', random.randint(1, args.teams), random.randint(1, args.teams))
+        for i in range(1, args.fixtures + 1)))
+    cursor.executemany(
+        "INSERT INTO favorite_teams (user_id, team_id, team_name, added_at) VALUES (?,?,?,?)", (
+            (u, t, f"Team {t}", when(365)) for u in range(1, args.users + 1)
+            for t in random.sample(range(1, args.teams + 1), args.favorites_per_user)))
+    cursor.executemany(
+        "INSERT INTO saved_fixtures (user_id, fixture_id, added_at) VALUES (?,?,?)", (
+            (u, f, when(180)) for u in range(1, args.users + 1)
+            for f in random.sample(range(1, args.fixtures + 1), args.saved_per_user)))
+    cursor.executemany(
+        "INSERT INTO login_logs (username, email, status, ip_address, timestamp) VALUES (?,?,?,?,?)", (
+            (f"user{u}", f"user{u}@example.com", random.choice(['SUCCESS', 'SUCCESS', 'FAILURE']),
+             '127.0.0.1', when(90))
+            for u in (random.randint(1, args.users) for _ in range(args.login_logs))))
+    conn.commit()
+
+def measure(conn, shapes, repeat):
+    results = {}
+    for name, (sql, params) in shapes.items():
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params())]
+        timings = []
+        for _ in range(repeat):
+            args = params()
+            start = time.perf_counter()
+            conn.execute(sql, args).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (statistics.median(timings), plan)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--teams', type=int, default=2000)
+    parser.add_argument('--fixtures', type=int, default=10000)
+    parser.add_argument('--favorites-per-user', type=int, default=3)
+    parser.add_argument('--saved-per-user', type=int, default=50)
+    parser.add_argument('--login-logs', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(42)
+    now = datetime.utcnow()
+    path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    engine = sa.create_engine(f"sqlite:///{path}")
+    quiet = lambda message: None
+    upgrade(engine, target=INDEX_MIGRATION - 1, log=quiet)
+    conn = sqlite3.connect(path)
+    print(f"Seeding {path} ...")
+    start = time.perf_counter()
+    seed(conn, args, now)
+    print(f"  {args.users} users, {args.users * args.saved_per_user} saved fixtures, "
+          f"{args.login_logs} login logs in {time.perf_counter() - start:.1f}s")
+
+    shapes = queries(args, now)
+    before = measure(conn, shapes, args.repeat)
+    print()
+    upgrade(engine)
+    conn.close()
+    conn = sqlite3.connect(path)  # fresh statement cache, so plans reflect the new indexes
+    after = measure(conn, shapes, args.repeat)
+
+    print(f"\n{'Query':<32} {'Before ms':>10} {'After ms':>10} {'Speedup':>8}")
+    print("-" * 64)
+    for name in shapes:
+        b, a = before[name][0], after[name][0]
+        print(f"{name:<32} {b:>10.3f} {a:>10.3f} {b / a if a else float('inf'):>7.0f}x")
+
+    print("\nQuery plans")
+    for name in shapes:
+        print(f"\n{name}")
+        print(f"  before: {' | '.join(before[name][1])}")
+        print(f"  after:  {' | '.join(after[name][1])}")
+
+    conn.close()
+    engine.dispose()
+    os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+End-to-end database smoke test, runnable against SQLite or PostgreSQL.
+
+Migrates an empty database to the latest schema, then drives the API through
+the Flask test client (demo API key, no network): register, login, favorites
+sync, calendar add/list/delete, ICS feed generation and 304 revalidation,
+shared team feeds.
+Also checks that the read bind can't write.
+
+    python dev_scripts/db_smoke.py                     # temporary SQLite file
+    python dev_scripts/db_smoke.py --pgserver          # throwaway local PostgreSQL
+    DATABASE_URL=postgresql://... python dev_scripts/db_smoke.py
+
+--pgserver needs `pip install pgserver psycopg2-binary`. A DATABASE_URL
+database is wiped first, so point it at a scratch database.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+FAILURES = []
+
+
+def check(label, ok, detail=''):
+    print(f"  {'✅' if ok else '❌'} {label}{f' ({detail})' if detail and not ok else ''}")
+    if not ok:
+        FAILURES.append(label)
+
+
+def reset_database(engine):
+    """Drop every table, including ones the models no longer declare"""
+    meta = sa.MetaData()
+    meta.reflect(bind=engine)
+    meta.drop_all(bind=engine)
+
+
+def run(workdir):
+    os.chdir(workdir)  # feed cache lives under ./instance
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'smoke.db')}")
+    os.environ.update({
+        'FOOTBALL_API_KEY': 'demo_key_12345',
+        'DB_AUTO_MIGRATE': 'True',
+        'FIXTURE_REFRESHER': 'False',
+        'FANOUT_SYNC': 'False',
+    })
+    from app import create_app
+    from extensions import db
+    from migrations import upgrade, status
+    from services import feed_cache
+
+    app = create_app(check_schema=False)
+    with app.app_context():
+        print(f"Database: {db.engine.url.render_as_string()} (binds: {sorted(b or 'primary' for b in db.engines)})")
+        reset_database(db.engine)
+        upgrade(db.engine, log=lambda message: None)
+        check('schema migrated', all(applied_at for _, _, applied_at in status(db.engine)))
+
+    client = app.test_client()
+
+    def call(method, path, token=None, **kwargs):
+        headers = kwargs.pop('headers', {})
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        return getattr(client, method)(path, headers=headers, **kwargs)
+
+    r = call('post', '/api/auth/register', json={'username': 'smoke', 'email': 'smoke@example.com', 'password': 'password1'})
+    check('register', r.status_code == 201, r.get_data(as_text=True))
+    r = call('post', '/api/auth/login', json={'username': 'smoke', 'password': 'password1'})
+    check('login', r.status_code == 200, r.get_data(as_text=True))
+    token = (r.get_json() or {}).get('access_token')
+
+    r = call('post', '/api/favorites/', token, json={'team_id': 33, 'team_name': 'Manchester United'})
+    check('add favorite', r.status_code in (200, 201), r.get_data(as_text=True))
+    r = call('post', '/api/favorites/', token, json={'team_id': 33, 'team_name': 'Manchester United'})
+    check('second add updates the subscription', r.status_code == 200, r.status_code)
+
+    job = call('post', '/api/favorites/sync', token).get_json()
+    deadline = time.time() + 30
+    while job.get('status') in ('queued', 'running') and time.time() < deadline:
+        time.sleep(0.1)
+        job = call('get', job['status_url'], token).get_json()
+    check('favorites sync', job.get('status') == 'done', job)
+
+    r = call('get', '/calendar/events', token)
+    events = r.get_json().get('events', [])
+    check('events listed from the read bind', r.status_code == 200 and events, r.status_code)
+
+    with app.app_context():
+        from models import Fixture
+        db.session.query(Fixture).update({Fixture.vevent: None})  # force first-time renders
+        db.session.commit()
+
+    r = call('get', '/sync/MatchDayByTM/smoke.ics')
+    body = r.get_data(as_text=True)
+    check('ics feed', r.status_code == 200 and body.count('BEGIN:VEVENT') == len(events),
+          f"{r.status_code}, {body.count('BEGIN:VEVENT')} events")
+    r = call('get', '/sync/MatchDayByTM/smoke.ics', headers={'If-None-Match': r.headers.get('ETag', '')})
+    check('ics revalidation', r.status_code == 304, r.status_code)
+    check('unknown feed', call('get', '/sync/MatchDayByTM/nobody.ics').status_code == 404)
+
+    with app.app_context():
+        from services.fixture_store import team_fixture_ids
+        team_fixtures = db.session.execute(team_fixture_ids(33)).scalars().all()
+        cups = db.session.query(Fixture).filter(Fixture.fixture_id.in_(team_fixtures),
+                                                Fixture.league_type == 'Cup').count()
+    r = call('get', '/sync/team/33.ics')
+    check('team feed', r.status_code == 200 and r.get_data(as_text=True).count('BEGIN:VEVENT') == len(team_fixtures),
+          f"{r.status_code}, {r.get_data(as_text=True).count('BEGIN:VEVENT')} of {len(team_fixtures)} events")
+    etag = r.headers.get('ETag', '')
+    r = call('get', '/sync/team/33.ics', headers={'If-None-Match': etag})
+    check('team feed revalidation', r.status_code == 304, r.status_code)
+    r = call('get', '/sync/team/33.ics?filters=Cup')
+    check('filtered team feed', r.status_code == 200 and r.get_data(as_text=True).count('BEGIN:VEVENT') == cups,
+          f"{r.get_data(as_text=True).count('BEGIN:VEVENT')} of {cups} cup events")
+    feeds = feed_cache.usage()['feeds']
+    variants = [call('get', f'/sync/team/33.ics?filters=Cup,nothing-{i}') for i in range(5)]
+    check('filters selecting the same leagues share one feed',
+          all(v.headers.get('ETag') == r.headers.get('ETag') for v in variants)
+          and feed_cache.usage()['feeds'] == feeds, f"{feeds} -> {feed_cache.usage()['feeds']} feeds")
+    check('unknown team feed', call('get', '/sync/team/999999.ics').status_code == 404)
+    with app.app_context():
+        db.session.query(Fixture).filter(Fixture.fixture_id == team_fixtures[0]) \
+            .update({Fixture.updated_at: datetime.utcnow() + timedelta(minutes=1), Fixture.vevent: None})
+        db.session.commit()
+    deadline = time.time() + 5
+    while (r := call('get', '/sync/team/33.ics', headers={'If-None-Match': etag})).status_code == 304 \
+            and time.time() < deadline:
+        time.sleep(0.1)
+    check('team feed rebuilt after a fixture change', r.status_code == 200, r.status_code)
+
+    with app.app_context():
+        rendered = db.session.query(Fixture).filter(Fixture.vevent.is_(None)).count() == 0
+        check('fragments persisted through the primary', rendered)
+
+        read = db.engines.get('read')
+        if read is not None:
+            try:
+                with read.begin() as conn:
+                    conn.execute(db.update(Fixture).values(vevent=None))
+                check('read bind is read-only', False, 'UPDATE succeeded')
+            except Exception:
+                check('read bind is read-only', True)
+
+    r = call('delete', f"/calendar/events/{events[0]['id']}", token) if events else None
+    check('delete event', r is not None and r.status_code == 200)
+    r = call('get', '/sync/MatchDayByTM/smoke.ics')
+    check('feed regenerated after delete', r.get_data(as_text=True).count('BEGIN:VEVENT') == len(events) - 1)
+    check('clear calendar', call('delete', '/calendar/clear', token).status_code == 200)
+
+    # A client-posted fixture reaches the poster's own feed (escaped), never the shared team feed
+    spoof = {'fixture': {'id': 990001, 'date': '2030-01-01T15:00:00+00:00', 'status': {'short': 'NS'},
+                         'venue': {'name': 'Ground', 'city': 'Town'}},
+             'league': {'id': 1, 'type': 'League', 'name': 'Spoof League'},
+             'teams': {'home': {'id': 33, 'name': 'Evil\nX-INJECTED:1'}, 'away': {'id': 1, 'name': 'B;C,D'}},
+             'goals': {'home': None, 'away': None}}
+    r = call('post', '/calendar/add', token, json={'fixtures': [spoof]})
+    check('client fixture saved', r.status_code == 200, r.status_code)
+    body = call('get', '/sync/MatchDayByTM/smoke.ics').get_data(as_text=True)
+    check('client fixture escaped', '990001@' in body and '\nX-INJECTED' not in body
+          and 'Evil\\nX-INJECTED:1 vs B\\;C\\,D' in body, body[-400:])
+    body = call('get', '/sync/team/33.ics').get_data(as_text=True)
+    check('client fixture kept out of the team feed', '990001@' not in body)
+    check('favorite removed', call('delete', '/api/favorites/33', token).status_code == 200)
+
+    # Deleted by another process (admin.py): this one's identity cache still has the user
+    with app.app_context():
+        with db.engine.begin() as conn:
+            user_id = conn.execute(sa.text("SELECT id FROM users WHERE username = 'smoke'")).scalar()
+            conn.execute(sa.text("DELETE FROM saved_fixtures WHERE user_id = :u"), {'u': user_id})
+            conn.execute(sa.text("DELETE FROM users WHERE id = :u"), {'u': user_id})
+    r = call('post', '/calendar/add', token, json={'fixtures': [spoof]})
+    check('deleted user cannot add events', r.status_code == 404, r.status_code)
+    r = call('post', '/api/favorites/', token, json={'team_id': 33, 'team_name': 'Manchester United'})
+    check('deleted user cannot subscribe', r.status_code == 404, r.status_code)
+    check('deleted user cannot sync', call('post', '/api/favorites/sync', token).status_code == 404)
+    with app.app_context():
+        with db.engine.connect() as conn:
+            orphans = sum(conn.execute(sa.text(f"SELECT COUNT(*) FROM {table} WHERE user_id = :u"), {'u': user_id}).scalar()
+                          for table in ('saved_fixtures', 'favorite_teams'))
+            orphans += conn.execute(sa.text("SELECT COUNT(*) FROM sync_jobs WHERE user_id = :u AND finished_at IS NULL"),
+                                    {'u': user_id}).scalar()
+        check('no rows written for the deleted user', orphans == 0, orphans)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pgserver', action='store_true', help='start a throwaway local PostgreSQL (pgserver package)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        if args.pgserver:
+            import pgserver
+            server = pgserver.get_server(os.path.join(workdir, 'pgdata'), cleanup_mode='stop')
+            # Pin the driver: newer SQLAlchemy releases default postgresql:// to psycopg 3
+            url = sa.engine.make_url(server.get_uri()).set(drivername='postgresql+psycopg2')
+            os.environ['DATABASE_URL'] = url.render_as_string(hide_password=False)
+        try:
+            run(workdir)
+        finally:
+            if server is not None:
+                server.cleanup()
+
+    print(f"\n{len(FAILURES)} check(s) failed" if FAILURES else "\nAll checks passed")
+    sys.exit(1 if FAILURES else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Concurrency stress test for the SQLite profile (services/db_profile.py).
+
+Runs the same mixed workload against a fresh database with the profile off
+and on: login logging (small write transactions), feed regeneration (read a
+user's fixtures, then write re-rendered VEVENTs) and feed reads, from many
+threads at once. Reports throughput, latency and "database is locked" errors.
+
+    python dev_scripts/stress_sqlite.py --threads 16 --seconds 10
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+
+def seed(db, models, users, fixtures, saved_per_user):
+    User, Fixture, SavedFixture = models
+    db.session.execute(db.insert(User), [
+        {'id': i, 'username': f"user{i}", 'email': f"user{i}@example.com", 'password_hash': 'x'}
+        for i in range(1, users + 1)])
+    db.session.execute(db.insert(Fixture), [
+        {'fixture_id': i, 'payload': '{}', 'status': 'NS', 'vevent': 'BEGIN:VEVENT\nEND:VEVENT'}
+        for i in range(1, fixtures + 1)])
+    db.session.execute(db.insert(SavedFixture), [
+        {'user_id': u, 'fixture_id': f} for u in range(1, users + 1)
+        for f in random.sample(range(1, fixtures + 1), saved_per_user)])
+    db.session.commit()
+
+
+def run_profile(profile, args):
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'stress.db')}",
+        'SQLITE_PROFILE': 'True' if profile else 'False',
+        'DB_AUTO_MIGRATE': 'True',
+    })
+    from app import create_app
+    from extensions import db
+    from models import User, Fixture, SavedFixture, LoginLog
+    from migrations import runner
+
+    app = create_app(check_schema=False)
+    with app.app_context():
+        runner.upgrade(db.engine, log=lambda message: None)
+        seed(db, (User, Fixture, SavedFixture), args.users, args.fixtures, args.saved_per_user)
+
+    def login(user_id):
+        db.session.add(LoginLog(username=f"user{user_id}", status='SUCCESS', ip_address='127.0.0.1'))
+        db.session.commit()
+
+    def regenerate(user_id):
+        # Same shape as an ICS rebuild: read the user's fixtures, then commit renders
+        rows = Fixture.query.join(SavedFixture, SavedFixture.fixture_id == Fixture.fixture_id) \
+            .filter(SavedFixture.user_id == user_id).all()
+        for row in rows[:5]:
+            row.vevent = f"BEGIN:VEVENT\nUID:{row.fixture_id}\nDTSTAMP:{time.time()}\nEND:VEVENT"
+        db.session.commit()
+
+    def read_feed(user_id):
+        db.session.query(Fixture.vevent).join(SavedFixture, SavedFixture.fixture_id == Fixture.fixture_id) \
+            .filter(SavedFixture.user_id == user_id).all()
+        db.session.rollback()
+
+    operations = [('login', login, 2), ('regenerate', regenerate, 1), ('read_feed', read_feed, 5)]
+    weighted = [op for op in operations for _ in range(op[2])]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.time() + args.seconds
+
+    def worker():
+        with app.app_context():
+            while time.time() < deadline:
+                name, op, _ = random.choice(weighted)
+                start = time.perf_counter()
+                try:
+                    op(random.randint(1, args.users))
+                    with lock:
+                        latencies[name].append((time.perf_counter() - start) * 1000)
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors['locked' if 'locked' in str(e) else type(e).__name__] += 1
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with app.app_context():
+        db.engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return latencies, errors
+
+
+def report(label, latencies, errors, seconds):
+    total = sum(len(v) for v in latencies.values())
+    print(f"\n{label}: {total / seconds:.0f} ops/s, errors: {dict(errors) or 'none'}")
+    print(f"  {'operation':<12} {'ops':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        p95 = values[int(len(values) * 0.95) - 1] if len(values) > 1 else values[0]
+        print(f"  {name:<12} {len(values):>7} {statistics.median(values):>8.1f} {p95:>8.1f} {values[-1]:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--fixtures', type=int, default=5000)
+    parser.add_argument('--saved-per-user', type=int, default=40)
+    parser.add_argument('--profile', choices=['both', 'on', 'off'], default='both')
+    args = parser.parse_args()
+
+    random.seed(7)
+    for profile in ([False, True] if args.profile == 'both' else [args.profile == 'on']):
+        latencies, errors = run_profile(profile, args)
+        report(f"SQLITE_PROFILE={profile}", latencies, errors, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -4718,9 +4718,30 @@ window.syncAllSubscriptions = async function() {
             headers: { 'Authorization': `Bearer ${token}` }
         });
         
-        const data = await res.json();
+        let data = await res.json();
         
-        if (res.ok) {
+        // Sync runs as a background job - poll until it finishes
+        if (res.ok && data.status_url) {
+            for (let i = 0; i < 120 && ['queued', 'running'].includes(data.status); i++) {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                if (data.teams_total) btn.textContent = `⏳ ${data.teams_done}/${data.teams_total}`;
+                const jobRes = await fetch(data.status_url, {
+                    headers: { 'Authorization': `Bearer ${token}` }
+                });
+                // A lost job is a failed sync, not an empty one
+                if (!jobRes.ok) throw new Error(`Sync status check failed (${jobRes.status})`);
+                data = await jobRes.json();
+            }
+        }
+        
+        if (res.ok && ['queued', 'running'].includes(data.status)) {
+            // Still going after the polling window - it keeps running server-side
+            btn.textContent = '⏳ Still syncing';
+            setTimeout(() => {
+                btn.textContent = originalText;
+                btn.disabled = false;
+            }, 2000);
+        } else if (res.ok && data.status === 'done') {
             btn.textContent = `✅ +${data.total_added || 0}`;
             setTimeout(() => {
                 btn.textContent = originalText;
@@ -49,6 +49,50 @@ EOF
 sudo systemctl start sport-backend
 sudo systemctl enable sport-backend
 
+# Background fixture refresher: gunicorn workers don't run it, so it gets its own service
+sudo tee /etc/systemd/system/sport-refresher.service <<EOF
+[Unit]
+Description=Sport Calendar fixture refresher
+After=network.target sport-backend.service
+
+[Service]
+User=root
+Group=www-data
+WorkingDirectory=/var/www/sport_calendar/backend
+Environment="PATH=/var/www/sport_calendar/backend/venv/bin"
+ExecStart=/var/www/sport_calendar/backend/venv/bin/python -m services.fixture_refresher
+Restart=always
+RestartSec=10
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+sudo systemctl start sport-refresher
+sudo systemctl enable sport-refresher
+
+# Scheduled fan-out favorites sync (FANOUT_SYNC_INTERVAL), also outside gunicorn
+sudo tee /etc/systemd/system/sport-fanout.service <<EOF
+[Unit]
+Description=Sport Calendar fan-out favorites sync
+After=network.target sport-backend.service
+
+[Service]
+User=root
+Group=www-data
+WorkingDirectory=/var/www/sport_calendar/backend
+Environment="PATH=/var/www/sport_calendar/backend/venv/bin"
+ExecStart=/var/www/sport_calendar/backend/venv/bin/python -m services.fanout_sync --loop
+Restart=always
+RestartSec=10
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+sudo systemctl start sport-fanout
+sudo systemctl enable sport-fanout
+
 # 5. Setup Node Frontend
 echo "💻 Setting up Node Frontend..."
 cd ../